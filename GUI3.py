@@ -1,12 +1,9 @@
-import cv2
-import torch
-from ultralytics import YOLO
-import os
-from datetime import datetime
+import queue
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
-import csv
+import detector
 
 # Default weight file path
 DEFAULT_WEIGHT_FILE = r"C:\Users\jigar\runs\detect\train2\weights\best.pt"
@@ -18,7 +15,13 @@ weight_file = DEFAULT_WEIGHT_FILE
 mode = "video"
 frame_interval = 1  # Default to every frame in video mode
 confidence_threshold = 0.5  # Default confidence threshold
-report_data = []
+worker = None  # Background detection worker for the current run
+closing = False  # Set once the window is closed while a run is still finishing
+preview_photo = None  # Tk image the preview label shows; repainted in place while the size stays the same
+next_progress_refresh = 0.0  # When poll_worker next redraws the progress bar
+
+POLL_INTERVAL_MS = 50  # How often the GUI drains the worker's message queue
+PROGRESS_REFRESH_SECONDS = 0.25  # How often the progress bar and readout are redrawn, whatever the frame rate
 
 def select_media():
     global media_path
@@ -55,110 +58,131 @@ def set_mode(selected_mode):
     else:
         interval_frame.pack_forget()
 
-def update_preview(frame):
-    max_preview_width = 400
-    max_preview_height = 300
-
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame_image = Image.fromarray(frame_rgb)
-    frame_image.thumbnail((max_preview_width, max_preview_height), Image.LANCZOS)
+def update_preview(frame_rgb):
+    # frame_rgb is already shrunk to 400x300 and converted by the worker's preview channel
+    global preview_photo
+    height, width = frame_rgb.shape[:2]
+    frame_image = Image.frombuffer("RGB", (width, height), frame_rgb, "raw", "RGB", 0, 1)
+    if preview_photo is None or (preview_photo.width(), preview_photo.height()) != (width, height):
+        preview_photo = ImageTk.PhotoImage(image=frame_image)
+        preview_label.config(image=preview_photo)
+    else:
+        preview_photo.paste(frame_image)
 
-    frame_tk = ImageTk.PhotoImage(image=frame_image)
-    preview_label.config(image=frame_tk)
-    preview_label.image = frame_tk
+def set_window_visible(event):
+    # No previews are prepared while the window is minimised
+    if event.widget is app:
+        preview_channel.visible = event.type == tk.EventType.Map
 
 def run_detection():
-    global report_data
+    global worker, frame_interval, next_progress_refresh
+    if worker is not None and worker.is_alive():
+        return  # A detection run is already in progress
+
     if not media_path or not output_dir:
         messagebox.showwarning("Input Required", "Please select a media file and output directory.")
         return
 
-    try:
-        model = YOLO(weight_file)
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not load YOLO model: {e}")
-        return
-
-    # Run detection based on selected mode
-    if mode == "video":
-        cap = cv2.VideoCapture(media_path)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Could not open video.")
-            return
-
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        progress_bar["maximum"] = total_frames
-        timestamped_dir = os.path.join(output_dir, datetime.now().strftime("output_%Y%m%d_%H%M%S"))
-        os.makedirs(timestamped_dir, exist_ok=True)
-
-        frame_count, saved_count = 0, 0
-        while cap.isOpened() and saved_count < 500:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % frame_interval == 0:
-                results = model.predict(source=frame)
-                annotated_frame = results[0].plot()
-
-                # Filter detections by confidence threshold
-                high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
-
-                if high_conf_detections:
-                    milliseconds = cap.get(cv2.CAP_PROP_POS_MSEC)
-                    seconds = int((milliseconds / 1000) % 60)
-                    minutes = int((milliseconds / (1000 * 60)) % 60)
-                    output_path = os.path.join(timestamped_dir, f"{minutes:02}_{seconds:02}_{frame_count:04}.jpg")
-                    cv2.imwrite(output_path, annotated_frame)
-                    update_preview(annotated_frame)
-                    saved_count += 1
-
-                    report_data.append({"Frame": frame_count, "Time": f"{minutes:02}:{seconds:02}", "Path": output_path})
-
-            frame_count += 1
-            progress_bar["value"] = frame_count
-            app.update_idletasks()
-
-        cap.release()
-        save_report(timestamped_dir)
-        reset_gui()
-        messagebox.showinfo("Process Complete", f"{saved_count} frames saved in: {timestamped_dir}")
-
-    elif mode == "image":
+    # Retrieve current frame interval from the slider
+    frame_interval = interval_slider.get()
+
+    settings = detector.make_settings(mode=mode, media_path=media_path, output_dir=output_dir,
+                                      weight_file=weight_file, frame_interval=frame_interval,
+                                      confidence_threshold=confidence_threshold)
+
+    # Detection runs on a background worker; poll_worker() picks up its messages
+    preview_channel.release()  # Drop a preview left over from the previous run
+    worker = detector.DetectionWorker(settings, preview_channel)
+    next_progress_refresh = 0.0
+    worker.start()
+    submit_button.config(text="Running...", state="disabled")
+    pause_button.config(text="Pause", state="normal")
+    cancel_button.config(state="normal")
+    app.after(POLL_INTERVAL_MS, poll_worker)
+
+def poll_worker():
+    global next_progress_refresh
+    if closing:
+        return  # on_close() is waiting for the worker to finish
+    while True:
         try:
-            img = cv2.imread(media_path)
-            results = model.predict(source=img)
-            high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
-
-            if high_conf_detections:
-                annotated_img = results[0].plot()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                output_path = os.path.join(output_dir, f"annotated_{timestamp}.jpg")
-                cv2.imwrite(output_path, annotated_img)
-                report_data.append({"Frame": "N/A", "Time": "N/A", "Path": output_path})
-                update_preview(annotated_img)
-                save_report(output_dir)
-                reset_gui()
-                messagebox.showinfo("Process Complete", f"Annotated image saved as {output_path}")
-            else:
-                reset_gui()
-                messagebox.showinfo("No Objects Detected", "No objects were detected in the image with the specified confidence.")
-        except Exception as e:
+            kind, payload = worker.messages.get_nowait()
+        except queue.Empty:
+            break
+
+        if kind == "start":
+            progress_bar["maximum"] = payload["total"]
+        elif kind == "done":
+            finish_detection(payload)
+            return
+        elif kind == "error":
             reset_gui()
-            messagebox.showerror("Error", f"Could not process image: {e}")
+            messagebox.showerror("Error", payload)
+            return
 
-def save_report(directory):
-    report_path = os.path.join(directory, "detection_report.csv")
-    with open(report_path, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["Frame", "Time", "Path"])
-        writer.writeheader()
-        writer.writerows(report_data)
+    # Only the newest frame is rendered; the worker skips previews until this one has been shown
+    frame_rgb = preview_channel.take()
+    if frame_rgb is not None:
+        update_preview(frame_rgb)
+        preview_channel.release()
+
+    # Progress is read from the worker's meter on a fixed clock rather than sent per frame
+    now = time.monotonic()
+    if now >= next_progress_refresh:
+        next_progress_refresh = now + PROGRESS_REFRESH_SECONDS
+        progress = worker.progress.snapshot()
+        progress_bar["value"] = progress["done"]
+        progress_label.config(text=detector.format_progress(progress))
+    app.after(POLL_INTERVAL_MS, poll_worker)
+
+def finish_detection(summary):
+    reset_gui()
+    if summary["cancelled"]:
+        messagebox.showinfo("Process Cancelled", f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["mode"] == "video":
+        messagebox.showinfo("Process Complete", f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["output_path"]:
+        messagebox.showinfo("Process Complete", f"Annotated image saved as {summary['output_path']}")
+    else:
+        messagebox.showinfo("No Objects Detected", "No objects were detected in the image with the specified confidence.")
+
+def toggle_pause():
+    if worker is None or not worker.is_alive():
+        return
+    if worker.control.paused:
+        worker.control.resume()
+        pause_button.config(text="Pause")
+    else:
+        worker.control.pause()
+        pause_button.config(text="Resume")
+
+def cancel_detection():
+    if worker is not None and worker.is_alive():
+        worker.control.cancel()
+        cancel_button.config(state="disabled")
+
+def on_close():
+    global closing
+    if worker is not None and worker.is_alive():
+        # The run is cancelled and the window only goes once it has closed its report and writers;
+        # exiting now would kill the daemon worker before they are flushed
+        closing = True
+        worker.control.cancel()
+        app.withdraw()
+        app.after(POLL_INTERVAL_MS, on_close)
+        return
+    app.destroy()
 
 def reset_gui():
+    global preview_photo
     # Reset preview and progress bar for the next detection
     preview_label.config(image="")
+    preview_photo = None
     progress_bar["value"] = 0
-    report_data.clear()
+    progress_label.config(text="")
+    submit_button.config(text="Submit", state="normal")
+    pause_button.config(text="Pause", state="disabled")
+    cancel_button.config(state="disabled")
 
 # Initialize GUI
 app = tk.Tk()
@@ -215,17 +239,32 @@ confidence_slider.pack(pady=5)
 submit_button = tk.Button(app, text="Submit", command=run_detection)
 submit_button.pack(pady=20)
 
+# Pause/cancel controls for a running detection
+control_frame = tk.Frame(app)
+control_frame.pack(pady=5)
+pause_button = tk.Button(control_frame, text="Pause", command=toggle_pause, state="disabled")
+pause_button.pack(side="left", padx=5)
+cancel_button = tk.Button(control_frame, text="Cancel", command=cancel_detection, state="disabled")
+cancel_button.pack(side="left", padx=5)
+
+app.protocol("WM_DELETE_WINDOW", on_close)
+
 # Preview area
 preview_frame = tk.LabelFrame(app, text="Preview", padx=10, pady=10)
 preview_frame.pack(pady=10)
 preview_label = tk.Label(preview_frame)
 preview_label.pack()
+preview_channel = detector.PreviewChannel(max_size=(400, 300))
+app.bind("<Map>", set_window_visible)
+app.bind("<Unmap>", set_window_visible)
 
 # Progress bar
 progress_frame = tk.Frame(app)
 progress_frame.pack(pady=10)
 progress_bar = ttk.Progressbar(progress_frame, length=500, mode="determinate")
 progress_bar.pack()
+progress_label = tk.Label(progress_frame, text="")
+progress_label.pack()
 
 # Start the GUI loop
 app.mainloop()
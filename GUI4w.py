@@ -1,12 +1,7 @@
-import cv2
-import torch
-from ultralytics import YOLO
-import os
-from datetime import datetime
+import queue
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import csv
+import detector
 
 # Default weight file path
 DEFAULT_WEIGHT_FILE = r"enter path to your yolo model here"
@@ -18,7 +13,10 @@ weight_file = DEFAULT_WEIGHT_FILE
 mode = "video"
 frame_interval = 1  # Default to every frame in video mode
 confidence_threshold = 0.5  # Default confidence threshold
-report_data = []
+worker = None  # Background detection worker for the current run
+closing = False  # Set once the window is closed while a run is still finishing
+
+POLL_INTERVAL_MS = 50  # How often the GUI drains the worker's message queue
 
 def select_media():
     global media_path
@@ -57,107 +55,93 @@ def set_mode(selected_mode):
         interval_frame.pack_forget()  # Hide frame interval in image mode
         confidence_frame.pack_forget()  # Confidence slider will also hide in image mode
 
-def update_preview(frame):
-    max_preview_width = 800  # Max width for the preview window
-    max_preview_height = 600  # Max height for the preview window
-
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame_image = Image.fromarray(frame_rgb)
-    frame_image.thumbnail((max_preview_width, max_preview_height), Image.LANCZOS)
-
-    frame_tk = ImageTk.PhotoImage(image=frame_image)
-
-
 def run_detection():
-    global report_data, confidence_threshold
+    global worker, confidence_threshold, frame_interval
+    if worker is not None and worker.is_alive():
+        return  # A detection run is already in progress
+
     if not media_path or not output_dir:
         messagebox.showwarning("Input Required", "Please select a media file and output directory.")
         return
 
     # Retrieve current confidence threshold from the slider
     confidence_threshold = confidence_slider.get()
+    frame_interval = interval_slider.get()
+
+    settings = detector.make_settings(mode=mode, media_path=media_path, output_dir=output_dir,
+                                      weight_file=weight_file, frame_interval=frame_interval,
+                                      confidence_threshold=confidence_threshold)
+
+    # Detection runs on a background worker; poll_worker() picks up its messages
+    worker = detector.DetectionWorker(settings)
+    worker.start()
+    submit_button.config(text="Running...", state="disabled")
+    pause_button.config(text="Pause", state="normal")
+    cancel_button.config(state="normal")
+    app.after(POLL_INTERVAL_MS, poll_worker)
+
+def poll_worker():
+    if closing:
+        return  # on_close() is waiting for the worker to finish
+    # This window has no preview area, so the worker's preview channel is never read
+    while True:
+        try:
+            kind, payload = worker.messages.get_nowait()
+        except queue.Empty:
+            break
 
-    try:
-        model = YOLO(weight_file)
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not load YOLO model: {e}")
-        return
-
-    # Run detection based on selected mode
-    if mode == "video":
-        cap = cv2.VideoCapture(media_path)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Could not open video.")
+        if kind == "done":
+            finish_detection(payload)
+            return
+        elif kind == "error":
+            reset_gui()
+            messagebox.showerror("Error", payload)
             return
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        timestamped_dir = os.path.join(output_dir, datetime.now().strftime("output_%Y%m%d_%H%M%S"))
-        os.makedirs(timestamped_dir, exist_ok=True)
-
-        frame_count, saved_count = 0, 0
-        while cap.isOpened() and saved_count < 500:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % frame_interval == 0:
-                results = model.predict(source=frame)
-                annotated_frame = results[0].plot()
-
-                # Filter detections by confidence threshold
-                high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
-
-                if high_conf_detections:
-                    milliseconds = cap.get(cv2.CAP_PROP_POS_MSEC)
-                    seconds = int((milliseconds / 1000) % 60)
-                    minutes = int((milliseconds / (1000 * 60)) % 60)
-                    output_path = os.path.join(timestamped_dir, f"{minutes:02}_{seconds:02}_{frame_count:04}.jpg")
-                    cv2.imwrite(output_path, annotated_frame)
-                    update_preview(annotated_frame)
-                    saved_count += 1
-
-                    report_data.append({"Frame": frame_count, "Time": f"{minutes:02}:{seconds:02}", "Path": output_path})
-
-            frame_count += 1
-
-        cap.release()
-        save_report(timestamped_dir)
-        reset_gui()
-        messagebox.showinfo("Process Complete", f"{saved_count} frames saved in: {timestamped_dir}")
+    app.after(POLL_INTERVAL_MS, poll_worker)
 
-    elif mode == "image":
-        try:
-            img = cv2.imread(media_path)
-            results = model.predict(source=img)
-            high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
-
-            if high_conf_detections:
-                annotated_img = results[0].plot()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                output_path = os.path.join(output_dir, f"annotated_{timestamp}.jpg")
-                cv2.imwrite(output_path, annotated_img)
-                report_data.append({"Frame": "N/A", "Time": "N/A", "Path": output_path})
-                update_preview(annotated_img)
-                save_report(output_dir)
-                reset_gui()
-                messagebox.showinfo("Process Complete", f"Annotated image saved as {output_path}")
-            else:
-                reset_gui()
-                messagebox.showinfo("No Objects Detected", "No objects were detected in the image with the specified confidence.")
-        except Exception as e:
-            reset_gui()
-            messagebox.showerror("Error", f"Could not process image: {e}")
+def finish_detection(summary):
+    reset_gui()
+    if summary["cancelled"]:
+        messagebox.showinfo("Process Cancelled", f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["mode"] == "video":
+        messagebox.showinfo("Process Complete", f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["output_path"]:
+        messagebox.showinfo("Process Complete", f"Annotated image saved as {summary['output_path']}")
+    else:
+        messagebox.showinfo("No Objects Detected", "No objects were detected in the image with the specified confidence.")
 
-def save_report(directory):
-    report_path = os.path.join(directory, "detection_report.csv")
-    with open(report_path, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["Frame", "Time", "Path"])
-        writer.writeheader()
-        writer.writerows(report_data)
+def toggle_pause():
+    if worker is None or not worker.is_alive():
+        return
+    if worker.control.paused:
+        worker.control.resume()
+        pause_button.config(text="Pause")
+    else:
+        worker.control.pause()
+        pause_button.config(text="Resume")
+
+def cancel_detection():
+    if worker is not None and worker.is_alive():
+        worker.control.cancel()
+        cancel_button.config(state="disabled")
+
+def on_close():
+    global closing
+    if worker is not None and worker.is_alive():
+        # The run is cancelled and the window only goes once it has closed its report and writers;
+        # exiting now would kill the daemon worker before they are flushed
+        closing = True
+        worker.control.cancel()
+        app.withdraw()
+        app.after(POLL_INTERVAL_MS, on_close)
+        return
+    app.destroy()
 
 def reset_gui():
-    report_data.clear()
-    submit_button.config(text="Submit")
+    submit_button.config(text="Submit", state="normal")
+    pause_button.config(text="Pause", state="disabled")
+    cancel_button.config(state="disabled")
 
 # Initialize GUI
 app = tk.Tk()
@@ -213,6 +197,16 @@ confidence_slider.pack(pady=5)
 submit_button = tk.Button(app, text="Submit", command=run_detection)
 submit_button.pack(pady=20)
 
+# Pause/cancel controls for a running detection
+control_frame = tk.Frame(app)
+control_frame.pack(pady=5)
+pause_button = tk.Button(control_frame, text="Pause", command=toggle_pause, state="disabled")
+pause_button.pack(side="left", padx=5)
+cancel_button = tk.Button(control_frame, text="Cancel", command=cancel_detection, state="disabled")
+cancel_button.pack(side="left", padx=5)
+
+app.protocol("WM_DELETE_WINDOW", on_close)
+
 # Preview area
 
 
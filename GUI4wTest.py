@@ -1,12 +1,12 @@
 import cv2
-import torch
-from ultralytics import YOLO
 import os
-from datetime import datetime
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
-import csv
+import detector
 
 # Default weight file path
 DEFAULT_WEIGHT_FILE = r"C:\Users\jigar\runs\detect\train2\weights\best.pt"
@@ -17,8 +17,23 @@ output_dir = None
 weight_file = DEFAULT_WEIGHT_FILE
 mode = "video"
 frame_interval = 1  # Default to every frame in video mode
+sample_seconds = 0.0  # Time-based sampling in video mode; 0 uses the frame interval instead
 confidence_threshold = 0.5  # Default confidence threshold
-report_data = []
+batch_size = detector.DEFAULT_SETTINGS["batch_size"]  # Frames per model.predict call in video mode
+worker = None  # Background detection worker for the current run
+closing = False  # Set once the window is closed while a run is still finishing
+preview_timer = None  # Time spent rendering previews during the current run
+next_progress_refresh = 0.0  # When poll_worker next redraws the progress bar
+preview_photo = None  # Tk image the preview label shows; repainted in place while the size stays the same
+resume_dir = None  # Earlier output folder of an interrupted video run to continue
+job_queue = []  # Videos queued for a multi-video run (video mode)
+job_totals = {}  # Frame count of each running job, keyed by its row in the job list
+
+POLL_INTERVAL_MS = 50  # How often the GUI drains the worker's message queue
+PROGRESS_REFRESH_SECONDS = 0.25  # How often the progress bar and readout are redrawn, whatever the frame rate
+TILE_SIZE = 640  # Tile side used by the "Tiled inference" option
+PREVIEW_SIZE = (480, 270)  # Largest preview shown under the progress bar
+ROI_PICK_MAX_SIZE = 1280  # Frames shown for drawing a region of interest are scaled down to fit this
 
 
 def select_media():
@@ -33,21 +48,121 @@ def select_media():
         media_label.config(text=f"Selected Image: {media_path}")
 
 
+def select_image_folder():
+    global media_path
+    media_path = filedialog.askdirectory(title="Select Image Folder")
+    media_label.config(text=f"Selected Image Folder: {media_path}")
+
+
+def add_jobs(paths):
+    for path in map(os.path.abspath, paths):
+        if path not in job_queue:
+            job_queue.append(path)
+            jobs_tree.insert("", "end", iid=str(len(job_queue) - 1), text=os.path.basename(path),
+                             values=("queued", ""))
+
+
+def add_job_videos():
+    add_jobs(filedialog.askopenfilenames(title="Add Videos to Queue",
+                                         filetypes=[("MP4 files", "*.mp4"), ("All files", "*.*")]))
+
+
+def add_job_folder():
+    folder = filedialog.askdirectory(title="Add Video Folder to Queue")
+    if folder:
+        add_jobs(detector.collect_videos(folder))
+
+
+def clear_jobs():
+    if worker is not None and worker.is_alive():
+        return
+    job_queue.clear()
+    jobs_tree.delete(*jobs_tree.get_children())
+
+
+def update_job_row(message):
+    row, kind, payload = str(message["job"]), message["kind"], message["payload"]
+    if kind == "start":
+        job_totals[row] = payload["total"]
+        jobs_tree.set(row, "status", "running")
+    elif kind == "progress":
+        jobs_tree.set(row, "progress", f"{payload}/{job_totals.get(row, '?')} frames")
+    elif kind in ("done", "failed", "cancelled"):
+        jobs_tree.set(row, "status", kind)
+        jobs_tree.set(row, "progress", payload["Error"] or f"{payload['Frames Saved']} frames saved")
+
+
 def select_output_directory():
     global output_dir
     output_dir = filedialog.askdirectory(title="Select Output Directory")
     output_dir_label.config(text=f"Output Directory: {output_dir}")
 
 
+def select_resume_directory():
+    global resume_dir
+    resume_dir = filedialog.askdirectory(title="Select Output Folder of the Interrupted Run") or None
+    if resume_dir:
+        resume_label.config(text=f"Resuming: {resume_dir}")
+    else:
+        resume_label.config(text="")
+
+
 def select_weight_file():
     global weight_file
     weight_file = filedialog.askopenfilename(title="Select YOLO Weights File (Optional)",
-                                             filetypes=[("YOLO Weights", "*.pt"), ("All files", "*.*")])
+                                             filetypes=[("YOLO Weights", "*.pt"), ("ONNX Models", "*.onnx"),
+                                                        ("OpenVINO Models", "*.xml"), ("All files", "*.*")])
     if weight_file:
         weight_file_label.config(text=f"Selected Weights File: {weight_file}")
     else:
         weight_file = DEFAULT_WEIGHT_FILE
         weight_file_label.config(text="Using Default Weights File")
+    detector.preload_model(weight_file)  # Load and warm up the model while the user sets up the run
+
+
+def select_backend(event=None):
+    precisions = detector.BACKEND_PRECISIONS[backend_combo.get()]
+    precision_combo.config(values=precisions)
+    if precision_combo.get() not in precisions:
+        precision_combo.set(precisions[0])
+
+
+def export_weights():
+    # One-click export of the selected .pt weights for the chosen backend, on a background thread.
+    # The export is cached next to the weights, so runs with this backend start straight away.
+    backend, precision = backend_combo.get(), precision_combo.get()
+    if backend == "pytorch" or not weight_file.endswith(".pt"):
+        messagebox.showwarning("Nothing to Export", "Select .pt weights and an ONNX or OpenVINO backend first.")
+        return
+    if not os.path.isfile(weight_file):
+        messagebox.showwarning("Weights Not Found", f"Could not find the weight file: {weight_file}")
+        return
+    outcome = queue.Queue()
+
+    def export():
+        try:
+            outcome.put(detector.export_model(weight_file, backend, precision))
+        except detector.DetectionError as e:
+            outcome.put(e)
+        except Exception as e:
+            # Anything else (e.g. an unwritable weights folder) must still reach check_export
+            outcome.put(detector.DetectionError(f"Export failed: {e}"))
+
+    def check_export():
+        try:
+            result = outcome.get_nowait()
+        except queue.Empty:
+            app.after(POLL_INTERVAL_MS * 4, check_export)
+            return
+        export_button.config(state="normal", text="Export Now")
+        if isinstance(result, Exception):
+            messagebox.showerror("Export Failed", str(result))
+        else:
+            messagebox.showinfo("Export Complete", f"Exported model saved as {result}")
+
+    export_button.config(state="disabled", text="Exporting...")
+    threading.Thread(target=export, name="model-export", daemon=True).start()
+    app.after(POLL_INTERVAL_MS * 4, check_export)
 
 
 def set_mode(selected_mode):
@@ -56,128 +171,291 @@ def set_mode(selected_mode):
     media_label.config(text=f"Select {mode.capitalize()}")
     media_button.config(text=f"Browse {mode.capitalize()}")
 
-    # Toggle frame interval and confidence slider visibility based on mode
+    # Toggle frame interval and confidence slider visibility based on mode; the frames go back
+    # in their place above the region of interest, not at the bottom of the window
     if mode == "video":
-        progress_bar.pack(pady=20)
-        interval_frame.pack(pady=10)  # Make frame interval visible in video mode
-        confidence_frame.pack(pady=10)  # Always show confidence frame
+        folder_button.pack_forget()
+        jobs_frame.pack(pady=10, before=roi_frame)  # Several videos can be queued instead of a single one
+        live_frame.pack(pady=10, before=roi_frame)
+        interval_frame.pack(pady=10, before=roi_frame)  # Make frame interval visible in video mode
+        batch_frame.pack(pady=10, before=roi_frame)
+        confidence_frame.pack(pady=10, before=roi_frame)  # Always show confidence frame
     else:
+        folder_button.pack(pady=5)  # Whole folders are processed in batches
+        jobs_frame.pack_forget()
+        live_frame.pack_forget()
         interval_frame.pack_forget()  # Hide frame interval in image mode
         confidence_frame.pack_forget()  # Confidence slider will also hide in image mode
-        progress_bar.pack_forget()
 
 
-def update_preview(frame):
-    max_preview_width = 800  # Max width for the preview window
-    max_preview_height = 600  # Max height for the preview window
+def update_preview(frame_rgb):
+    # frame_rgb is already shrunk and converted by the worker's preview channel
+    global preview_photo
+    height, width = frame_rgb.shape[:2]
+    frame_image = Image.frombuffer("RGB", (width, height), frame_rgb, "raw", "RGB", 0, 1)
+    if preview_photo is None or (preview_photo.width(), preview_photo.height()) != (width, height):
+        preview_photo = ImageTk.PhotoImage(image=frame_image)
+        preview_label.config(image=preview_photo)
+    else:
+        preview_photo.paste(frame_image)
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame_image = Image.fromarray(frame_rgb)
-    frame_image.thumbnail((max_preview_width, max_preview_height), Image.LANCZOS)
 
-    frame_tk = ImageTk.PhotoImage(image=frame_image)
+def set_window_visible(event):
+    # No previews are prepared while the window is minimised
+    if event.widget is app:
+        preview_channel.visible = event.type == tk.EventType.Map
+
+
+def draw_roi_rectangle():
+    # Shows the selected image or the first frame of the selected video and adds the rectangle
+    # dragged on it to the region of interest list
+    if not media_path or os.path.isdir(media_path):
+        messagebox.showwarning("Input Required", "Please select a video or image file first.")
+        return
+    if mode == "video":
+        cap = cv2.VideoCapture(media_path)
+        ret, frame = cap.read()
+        cap.release()
+    else:
+        frame = cv2.imread(media_path)
+        ret = frame is not None
+    if not ret:
+        messagebox.showerror("Error", "Could not read a frame from the selected file.")
+        return
+
+    # Drawn on a Tk canvas rather than with cv2.selectROI, which the headless OpenCV build lacks
+    scale = min(1.0, ROI_PICK_MAX_SIZE / max(frame.shape[:2]))
+    shown = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+    picker = tk.Toplevel(app)
+    picker.title("Drag a region of interest, then close this window")
+    photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(shown, cv2.COLOR_BGR2RGB)))
+    canvas = tk.Canvas(picker, width=photo.width(), height=photo.height(), cursor="crosshair")
+    canvas.create_image(0, 0, image=photo, anchor="nw")
+    canvas.image = photo  # Keep a reference so the image isn't garbage collected
+    canvas.pack()
+    drag = {}
+
+    def press(event):
+        drag["start"] = (event.x, event.y)
+        canvas.delete("roi")
+        canvas.create_rectangle(event.x, event.y, event.x, event.y, outline="red", width=2, tags="roi")
+
+    def move(event):
+        canvas.coords("roi", *drag["start"], event.x, event.y)
+
+    def release(event):
+        (x1, y1), (x2, y2) = drag.pop("start"), (event.x, event.y)
+        if abs(x2 - x1) < 2 or abs(y2 - y1) < 2:
+            return
+        region = [round(value / scale) for value in (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))]
+        text = roi_entry.get().strip()
+        roi_entry.delete(0, tk.END)
+        roi_entry.insert(0, "; ".join(filter(None, [text, ",".join(map(str, region))])))
+
+    canvas.bind("<ButtonPress-1>", press)
+    canvas.bind("<B1-Motion>", move)
+    canvas.bind("<ButtonRelease-1>", release)
 
 
 def run_detection():
-    global report_data, confidence_threshold
-    if not media_path or not output_dir:
+    global worker, preview_timer, next_progress_refresh, confidence_threshold, batch_size, frame_interval, sample_seconds, resume_dir
+    if worker is not None and worker.is_alive():
+        return  # A detection run is already in progress
+
+    live_source = live_entry.get().strip() if mode == "video" else ""
+    use_stream = bool(live_source) or (mode == "video" and live_var.get() and bool(media_path))
+    use_jobs = mode == "video" and bool(job_queue) and not use_stream
+    if not (media_path or use_jobs or live_source) or not output_dir:
         messagebox.showwarning("Input Required", "Please select a media file and output directory.")
         return
 
     # Retrieve current confidence threshold from the slider
     confidence_threshold = confidence_slider.get()
-
     try:
-        model = YOLO(weight_file)
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not load YOLO model: {e}")
+        class_thresholds = detector.parse_class_thresholds(class_threshold_entry.get())
+    except ValueError as e:
+        messagebox.showwarning("Invalid Class Thresholds", f"{e}\nUse the form: drone=0.35, bird=0.6")
         return
-
-    # Run detection based on selected mode
-    if mode == "video":
-        cap = cv2.VideoCapture(media_path)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Could not open video.")
+    try:
+        roi = detector.parse_regions(roi_entry.get()) or None
+    except ValueError as e:
+        messagebox.showwarning("Invalid Region of Interest", str(e))
+        return
+    batch_size = batch_slider.get()
+    frame_interval = interval_slider.get()
+    sample_seconds = sample_slider.get()
+
+    # A folder picked in image mode is processed as a batch of images, and queued
+    # videos are shared out between worker processes
+    run_media = media_path
+    if use_stream:
+        # A live URL or camera, or the selected video played back in real time as a stand-in
+        run_mode, run_media = "stream", live_source or media_path
+    elif use_jobs:
+        run_mode, run_media = "jobs", list(job_queue)
+        for row in jobs_tree.get_children():
+            jobs_tree.item(row, values=("queued", ""))
+    elif mode == "image" and os.path.isdir(media_path):
+        run_mode = "images"
+    else:
+        run_mode = mode
+
+    settings = detector.make_settings(mode=run_mode, media_path=run_media, output_dir=output_dir,
+                                      resume_dir=resume_dir if run_mode == "video" else None,
+                                      weight_file=weight_file, frame_interval=frame_interval,
+                                      sample_seconds=sample_seconds, confidence_threshold=confidence_threshold,
+                                      class_thresholds=class_thresholds, roi=roi, parquet=parquet_var.get(),
+                                      image_format=format_combo.get(), image_quality=quality_slider.get(),
+                                      output_scale=scale_slider.get(), save_raw=raw_var.get(),
+                                      video_output=save_as_combo.get(), track=track_var.get(),
+                                      motion_gate=motion_var.get(), adaptive_sampling=adaptive_var.get(),
+                                      tile_size=TILE_SIZE if tile_var.get() else 0, batch_size=batch_size,
+                                      backend=backend_combo.get(), precision=precision_combo.get(),
+                                      job_workers=workers_slider.get())
+
+    # A resume point only applies to the next run
+    resume_dir = None
+    resume_label.config(text="")
+
+    # Detection runs on a background worker; poll_worker() picks up its messages
+    preview_timer = detector.StageTimer()
+    next_progress_refresh = 0.0
+    status_label.config(text="")
+    preview_channel.release()  # Drop a preview left over from the previous run
+    worker = detector.DetectionWorker(settings, preview_channel)
+    worker.start()
+    submit_button.config(text="Running...", state="disabled")
+    pause_button.config(text="Pause", state="normal")
+    cancel_button.config(state="normal")
+    app.after(POLL_INTERVAL_MS, poll_worker)
+
+
+def show_progress():
+    # Counts are read from the worker's meter rather than sent per frame, so redrawing costs
+    # the same for 5 fps and 60 fps footage
+    progress = worker.progress.snapshot()
+    if str(progress_bar["mode"]) == "determinate":  # cget returns a Tcl object, not a str
+        progress_bar["value"] = progress["done"]
+    status_label.config(text=detector.format_progress(progress))
+
+
+def poll_worker():
+    global next_progress_refresh
+    if closing:
+        return  # on_close() is waiting for the worker to finish
+    while True:
+        try:
+            kind, payload = worker.messages.get_nowait()
+        except queue.Empty:
+            break
+
+        if kind == "start":
+            if payload["total"]:
+                progress_bar["maximum"] = payload["total"]  # Set the max value for the progress bar
+                progress_bar["value"] = 0  # Reset progress bar
+            else:
+                progress_bar.config(mode="indeterminate")  # A live stream has no end to measure against
+                progress_bar.start()
+        elif kind == "job":
+            update_job_row(payload)
+        elif kind == "done":
+            finish_detection(payload)
+            return
+        elif kind == "error":
+            reset_gui()
+            messagebox.showerror("Error", payload)
             return
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        progress_bar["maximum"] = total_frames  # Set the max value for the progress bar
-        progress_bar["value"] = 0  # Reset progress bar
-
-        timestamped_dir = os.path.join(output_dir, datetime.now().strftime("output_%Y%m%d_%H%M%S"))
-        os.makedirs(timestamped_dir, exist_ok=True)
-
-        frame_count, saved_count = 0, 0
-        while cap.isOpened() and saved_count < 500:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % frame_interval == 0:
-                results = model.predict(source=frame)
-                annotated_frame = results[0].plot()
+    # Only the newest frame is rendered; the worker skips previews until this one has been shown
+    frame_rgb = preview_channel.take()
+    if frame_rgb is not None:
+        with preview_timer.time("preview"):
+            update_preview(frame_rgb)
+        preview_channel.release()
+    now = time.monotonic()
+    if now >= next_progress_refresh:
+        next_progress_refresh = now + PROGRESS_REFRESH_SECONDS
+        show_progress()
+    app.after(POLL_INTERVAL_MS, poll_worker)
+
+
+def finish_detection(summary):
+    progress_bar["value"] = 0  # Reset progress bar after completion
+    reset_gui()
+    if summary.get("performance"):
+        # Where the time went, also saved as performance.json in the output folder
+        status = detector.format_performance(summary["performance"])
+        preview = preview_timer.summary().get("preview")
+        if preview:
+            status += f"\npreview {preview['mean_ms']:.1f}/{preview['p95_ms']:.1f} ms over {preview['count']} updates"
+        status_label.config(text=status)
+    if summary["mode"] == "stream":
+        # Streams usually end by being cancelled, so their figures are shown either way
+        latency = summary["latency_ms"] or {"mean": 0, "p95": 0}
+        messagebox.showinfo("Stream Stopped", f"{summary['saved']} frames saved in: {summary['output_dir']}\n"
+                                              f"{summary['processed']} of {summary['read']} frames processed, "
+                                              f"{summary['dropped']} dropped.\nLatency: mean {latency['mean']} ms, "
+                                              f"p95 {latency['p95']} ms.")
+    elif summary["cancelled"]:
+        messagebox.showinfo("Process Cancelled", f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["mode"] == "video":
+        stats = summary["writer"]
+        gated = f"\n{summary['gated']} frames skipped without motion." if summary["gated"] is not None else ""
+        messagebox.showinfo("Process Complete", f"{summary['saved']} frames saved in: {summary['output_dir']}\n"
+                                                f"{stats['bytes'] / 1e6:.1f} MB written, "
+                                                f"{stats['encode_seconds']:.1f}s spent encoding.{gated}")
+    elif summary["mode"] == "jobs":
+        failed = sum(1 for row in summary["jobs"] if row["Status"] == "failed")
+        messagebox.showinfo("Process Complete",
+                            f"{len(summary['jobs'])} videos processed ({failed} failed), {summary['saved']} frames "
+                            f"saved in: {summary['output_dir']}\nSee {detector.JOBS_REPORT} for details.")
+    elif summary["mode"] == "images":
+        messagebox.showinfo("Process Complete",
+                            f"{summary['saved']} annotated images saved in: {summary['output_dir']}\n"
+                            f"{summary['skipped']} already processed, {summary['failed']} could not be read.")
+    elif summary["output_path"]:
+        messagebox.showinfo("Process Complete", f"Annotated image saved as {summary['output_path']}")
+    else:
+        messagebox.showinfo("No Objects Detected",
+                            "No objects were detected in the image with the specified confidence.")
 
-                # Filter detections by confidence threshold
-                high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
 
-                if high_conf_detections:
-                    milliseconds = cap.get(cv2.CAP_PROP_POS_MSEC)
-                    seconds = int((milliseconds / 1000) % 60)
-                    minutes = int((milliseconds / (1000 * 60)) % 60)
-                    output_path = os.path.join(timestamped_dir, f"{minutes:02}_{seconds:02}_{frame_count:04}.jpg")
-                    cv2.imwrite(output_path, annotated_frame)
-                    update_preview(annotated_frame)
-                    saved_count += 1
+def toggle_pause():
+    if worker is None or not worker.is_alive():
+        return
+    if worker.control.paused:
+        worker.control.resume()
+        pause_button.config(text="Pause")
+    else:
+        worker.control.pause()
+        pause_button.config(text="Resume")
 
-                    report_data.append(
-                        {"Frame": frame_count, "Time": f"{minutes:02}:{seconds:02}", "Path": output_path})
 
-            frame_count += 1
-            progress_bar["value"] = frame_count  # Update progress bar
-            app.update_idletasks()  # Refresh the GUI to show progress
+def cancel_detection():
+    if worker is not None and worker.is_alive():
+        worker.control.cancel()
+        cancel_button.config(state="disabled")
 
-        cap.release()
-        progress_bar["value"] = 0  # Reset progress bar after completion
-        save_report(timestamped_dir)
-        reset_gui()
-        messagebox.showinfo("Process Complete", f"{saved_count} frames saved in: {timestamped_dir}")
 
-    elif mode == "image":
-        try:
-            img = cv2.imread(media_path)
-            results = model.predict(source=img)
-            high_conf_detections = [box for box in results[0].boxes if box.conf >= confidence_threshold]
-
-            if high_conf_detections:
-                annotated_img = results[0].plot()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                output_path = os.path.join(output_dir, f"annotated_{timestamp}.jpg")
-                cv2.imwrite(output_path, annotated_img)
-                report_data.append({"Frame": "N/A", "Time": "N/A", "Path": output_path})
-                update_preview(annotated_img)
-                save_report(output_dir)
-                reset_gui()
-                messagebox.showinfo("Process Complete", f"Annotated image saved as {output_path}")
-            else:
-                reset_gui()
-                messagebox.showinfo("No Objects Detected",
-                                    "No objects were detected in the image with the specified confidence.")
-        except Exception as e:
-            reset_gui()
-            messagebox.showerror("Error", f"Could not process image: {e}")
-
-
-def save_report(directory):
-    report_path = os.path.join(directory, "detection_report.csv")
-    with open(report_path, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["Frame", "Time", "Path"])
-        writer.writeheader()
-        writer.writerows(report_data)
+def on_close():
+    global closing
+    if worker is not None and worker.is_alive():
+        # The run is cancelled and the window only goes once it has closed its report and writers;
+        # exiting now would kill the daemon worker before they are flushed
+        closing = True
+        worker.control.cancel()
+        app.withdraw()
+        app.after(POLL_INTERVAL_MS, on_close)
+        return
+    app.destroy()
 
 
 def reset_gui():
-    report_data.clear()
-    submit_button.config(text="Submit")
+    progress_bar.stop()
+    progress_bar.config(mode="determinate")
+    submit_button.config(text="Submit", state="normal")
+    pause_button.config(text="Pause", state="disabled")
+    cancel_button.config(state="disabled")
 
 
 def show_help():
@@ -186,84 +464,235 @@ def show_help():
         "1. Frame Interval:\n"
         "   - This setting is used to control how often frames are processed in video mode.\n"
         "   - A lower interval processes more frames, potentially increasing accuracy but slowing down processing.\n"
-        "   - A higher interval processes fewer frames, making processing faster but potentially missing some detections.\n\n"
+        "   - A higher interval processes fewer frames, making processing faster but potentially missing some detections.\n"
+        "   - Skipped frames are never fully decoded, so a 10x interval is close to 10x less decoding work.\n"
+        "   - Set 'one frame every N seconds' above 0 to sample by time instead of by frame count.\n\n"
 
         "2. Confidence Threshold:\n"
         "   - This controls the confidence level required for a detection to be considered valid.\n"
         "   - Higher confidence threshold means only highly certain detections are considered.\n"
-        "   - Lower confidence threshold may include more detections, but with increased possibility of false positives.\n\n"
+        "   - Lower confidence threshold may include more detections, but with increased possibility of false positives.\n"
+        "   - Per-class thresholds override it for individual classes, e.g. 'drone=0.35, bird=0.6'.\n\n"
+
+        "3. Batch Size:\n"
+        "   - Number of sampled video frames (or images from a folder) sent through the model together.\n"
+        "   - Larger batches make better use of the CPU on long videos, at the cost of more memory.\n\n"
+
+        "4. Video Saves As:\n"
+        "   - frames: one image per frame with detections.\n"
+        "   - video: all frames with detections in a single detections.mp4.\n"
+        "   - clips: a short clip per burst of detections, with a second of context before and after.\n\n"
+
+        "5. Video Queue:\n"
+        "   - Add several videos (or a whole folder) to process them in one run, several at a time.\n"
+        "   - Parallel Jobs sets how many videos are processed at once; the CPU cores are split between them.\n"
+        "   - When the queue is empty, the single selected video is processed.\n\n"
 
-        "3. Weight File:\n"
+        "6. Weight File:\n"
         "   - Most important part of the application.Accuracy depends On which YOLO version you are using and model weights\n"
         "   - This is the YOLO model file containing learned parameters for object detection.\n"
         "   - Selecting a custom weight file allows you to use a model specifically trained for your detection needs.\n"
-        "   - If no file is selected, the default weight file is used."
+        "   - If no file is selected, the default weight file is used.\n"
+        "   - Exported ONNX (.onnx) and OpenVINO (.xml) models can be selected too. With .pt weights, the Backend\n"
+        "     setting exports them once (cached next to the weights) and runs the export, usually faster on CPU.\n"
+        "     INT8/FP16 exports are faster still; check their detections with: python -m detector compare"
     )
 
     # Display the information in a message box
     messagebox.showinfo("Help", help_text)
 
 
-# Initialize GUI
-app = tk.Tk()
-app.title("Drone and Bird Detection")
-app.geometry("1920x1080")  # Set default screen size to 1920x1080
-
-help_button = tk.Button(app, text="Help", command=show_help)
-help_button.pack(pady=8)
-
-# Mode selection
-mode_frame = tk.LabelFrame(app, text="Mode Selection", padx=10, pady=10)
-mode_frame.pack(pady=10)
-video_radio = tk.Radiobutton(mode_frame, text="Video", variable=mode, value="video", command=lambda: set_mode("video"))
-video_radio.pack(side="left")
-video_radio.select()
-image_radio = tk.Radiobutton(mode_frame, text="Image", variable=mode, value="image", command=lambda: set_mode("image"))
-image_radio.pack(side="left")
-
-# Media selection
-media_frame = tk.LabelFrame(app, text="Media Selection", padx=10, pady=10)
-media_frame.pack(pady=10)
-media_label = tk.Label(media_frame, text="Select Video or Image")
-media_label.pack(pady=5)
-media_button = tk.Button(media_frame, text="Browse Video", command=select_media)
-media_button.pack(pady=5)
-
-# Output directory selection
-output_frame = tk.LabelFrame(app, text="Output Directory", padx=10, pady=10)
-output_frame.pack(pady=10)
-output_dir_label = tk.Label(output_frame, text="Select Output Directory")
-output_dir_label.pack(pady=5)
-output_dir_button = tk.Button(output_frame, text="Browse Output Directory", command=select_output_directory)
-output_dir_button.pack(pady=5)
-
-# Weight file selection
-weight_frame = tk.LabelFrame(app, text="Weights File Selection", padx=10, pady=10)
-weight_frame.pack(pady=10)
-weight_file_label = tk.Label(weight_frame, text="Using Default Weights File")
-weight_file_label.pack(pady=5)
-weight_file_button = tk.Button(weight_frame, text="Browse Weights File", command=select_weight_file)
-weight_file_button.pack(pady=5)
-
-# Frame interval slider (only for video mode)
-interval_frame = tk.LabelFrame(app, text="Frame Interval", padx=10, pady=10)
-interval_slider = tk.Scale(interval_frame, from_=1, to=10, orient="horizontal", resolution=1)
-interval_slider.set(frame_interval)
-interval_slider.pack(pady=5)
-
-# Confidence slider
-confidence_frame = tk.LabelFrame(app, text="Confidence Threshold", padx=10, pady=10)
-confidence_slider = tk.Scale(confidence_frame, from_=0.0, to=1.0, orient="horizontal", resolution=0.01)
-confidence_slider.set(confidence_threshold)
-confidence_slider.pack(pady=5)
-
-# Progress bar
-progress_bar = ttk.Progressbar(app, orient="horizontal", length=400, mode="determinate")
-progress_bar.pack(pady=20)
-
-# Submit button
-submit_button = tk.Button(app, text="Submit", command=run_detection)
-submit_button.pack(pady=10)
-
-# Start the GUI loop
-app.mainloop()
+if __name__ == "__main__":  # Job processes re-import this module; they must not open a window
+    # Initialize GUI
+    app = tk.Tk()
+    app.title("Drone and Bird Detection")
+    app.geometry("1920x1080")  # Set default screen size to 1920x1080
+
+    help_button = tk.Button(app, text="Help", command=show_help)
+    help_button.pack(pady=8)
+
+    # Mode selection
+    mode_frame = tk.LabelFrame(app, text="Mode Selection", padx=10, pady=10)
+    mode_frame.pack(pady=10)
+    video_radio = tk.Radiobutton(mode_frame, text="Video", variable=mode, value="video", command=lambda: set_mode("video"))
+    video_radio.pack(side="left")
+    video_radio.select()
+    image_radio = tk.Radiobutton(mode_frame, text="Image", variable=mode, value="image", command=lambda: set_mode("image"))
+    image_radio.pack(side="left")
+
+    # Media selection
+    media_frame = tk.LabelFrame(app, text="Media Selection", padx=10, pady=10)
+    media_frame.pack(pady=10)
+    media_label = tk.Label(media_frame, text="Select Video or Image")
+    media_label.pack(pady=5)
+    media_button = tk.Button(media_frame, text="Browse Video", command=select_media)
+    media_button.pack(pady=5)
+    folder_button = tk.Button(media_frame, text="Browse Image Folder", command=select_image_folder)
+
+    # Output directory selection
+    output_frame = tk.LabelFrame(app, text="Output Directory", padx=10, pady=10)
+    output_frame.pack(pady=10)
+    output_dir_label = tk.Label(output_frame, text="Select Output Directory")
+    output_dir_label.pack(pady=5)
+    output_dir_button = tk.Button(output_frame, text="Browse Output Directory", command=select_output_directory)
+    output_dir_button.pack(pady=5)
+    resume_button = tk.Button(output_frame, text="Resume Interrupted Run...", command=select_resume_directory)
+    resume_button.pack(pady=5)
+    resume_label = tk.Label(output_frame, text="")
+    resume_label.pack()
+    parquet_var = tk.BooleanVar(value=False)
+    parquet_check = tk.Checkbutton(output_frame, text="Also write detections.parquet (needs pyarrow)",
+                                   variable=parquet_var)
+    parquet_check.pack(pady=5)
+    track_var = tk.BooleanVar(value=False)
+    track_check = tk.Checkbutton(output_frame, text="Track objects (one event and best frame per object, video)",
+                                 variable=track_var)
+    track_check.pack(pady=5)
+
+    # Saved image options
+    image_options_frame = tk.LabelFrame(app, text="Saved Images", padx=10, pady=10)
+    image_options_frame.pack(pady=10)
+    format_combo = ttk.Combobox(image_options_frame, values=list(detector.IMAGE_FORMATS), state="readonly", width=6)
+    format_combo.set(detector.DEFAULT_SETTINGS["image_format"])
+    format_combo.pack(side="left", padx=5)
+    quality_slider = tk.Scale(image_options_frame, from_=10, to=100, orient="horizontal", resolution=5,
+                              label="Quality")
+    quality_slider.set(detector.DEFAULT_SETTINGS["image_quality"])
+    quality_slider.pack(side="left", padx=5)
+    scale_slider = tk.Scale(image_options_frame, from_=0.25, to=1.0, orient="horizontal", resolution=0.25,
+                            label="Scale")
+    scale_slider.set(detector.DEFAULT_SETTINGS["output_scale"])
+    scale_slider.pack(side="left", padx=5)
+    raw_var = tk.BooleanVar(value=False)
+    raw_check = tk.Checkbutton(image_options_frame, text="Raw frame + .json boxes", variable=raw_var)
+    raw_check.pack(side="left", padx=5)
+    tk.Label(image_options_frame, text="Video saves as").pack(side="left", padx=5)
+    save_as_combo = ttk.Combobox(image_options_frame, values=list(detector.VIDEO_OUTPUTS), state="readonly", width=7)
+    save_as_combo.set(detector.DEFAULT_SETTINGS["video_output"])
+    save_as_combo.pack(side="left", padx=5)
+
+    # Weight file selection
+    weight_frame = tk.LabelFrame(app, text="Weights File Selection", padx=10, pady=10)
+    weight_frame.pack(pady=10)
+    weight_file_label = tk.Label(weight_frame, text="Using Default Weights File")
+    weight_file_label.pack(pady=5)
+    weight_file_button = tk.Button(weight_frame, text="Browse Weights File", command=select_weight_file)
+    weight_file_button.pack(pady=5)
+    backend_combo = ttk.Combobox(weight_frame, values=list(detector.BACKEND_PRECISIONS), state="readonly", width=10)
+    backend_combo.set(detector.DEFAULT_SETTINGS["backend"])
+    backend_combo.bind("<<ComboboxSelected>>", select_backend)
+    precision_combo = ttk.Combobox(weight_frame, state="readonly", width=6)
+    precision_combo.set(detector.DEFAULT_SETTINGS["precision"])
+    select_backend()
+    tk.Label(weight_frame, text="Backend").pack(side="left")
+    backend_combo.pack(side="left", padx=5)
+    precision_combo.pack(side="left", padx=5)
+    export_button = tk.Button(weight_frame, text="Export Now", command=export_weights)
+    export_button.pack(side="left", padx=5)
+
+    # Video job queue (only for video mode)
+    jobs_frame = tk.LabelFrame(app, text="Video Queue", padx=10, pady=10)
+    jobs_tree = ttk.Treeview(jobs_frame, columns=("status", "progress"), height=5)
+    jobs_tree.heading("#0", text="Video")
+    jobs_tree.heading("status", text="Status")
+    jobs_tree.heading("progress", text="Progress")
+    jobs_tree.pack(pady=5)
+    jobs_buttons = tk.Frame(jobs_frame)
+    jobs_buttons.pack()
+    tk.Button(jobs_buttons, text="Add Videos", command=add_job_videos).pack(side="left", padx=5)
+    tk.Button(jobs_buttons, text="Add Folder", command=add_job_folder).pack(side="left", padx=5)
+    tk.Button(jobs_buttons, text="Clear", command=clear_jobs).pack(side="left", padx=5)
+    workers_slider = tk.Scale(jobs_frame, from_=1, to=max(1, os.cpu_count() or 1), orient="horizontal",
+                              resolution=1, label="Parallel Jobs")
+    workers_slider.set(detector.DEFAULT_SETTINGS["job_workers"])
+    workers_slider.pack(pady=5)
+
+    # Live source (video mode): an RTSP/HTTP URL or camera number, or the selected video in real time
+    live_frame = tk.LabelFrame(app, text="Live Stream", padx=10, pady=10)
+    tk.Label(live_frame, text="RTSP/HTTP URL or camera number (empty: use the selected video)").pack()
+    live_entry = tk.Entry(live_frame, width=40)
+    live_entry.pack(pady=5)
+    live_var = tk.BooleanVar(value=False)
+    live_check = tk.Checkbutton(live_frame, text="Play the selected video as a live stream (test)", variable=live_var)
+    live_check.pack(pady=5)
+
+    # Frame interval slider (only for video mode)
+    interval_frame = tk.LabelFrame(app, text="Frame Interval", padx=10, pady=10)
+    interval_slider = tk.Scale(interval_frame, from_=1, to=10, orient="horizontal", resolution=1)
+    interval_slider.set(frame_interval)
+    interval_slider.pack(pady=5)
+    sample_slider = tk.Scale(interval_frame, from_=0.0, to=10.0, orient="horizontal", resolution=0.5,
+                             label="Or one frame every N seconds")
+    sample_slider.set(sample_seconds)
+    sample_slider.pack(pady=5)
+    adaptive_var = tk.BooleanVar(value=False)
+    adaptive_check = tk.Checkbutton(interval_frame, text="Every frame for a while after a detection",
+                                    variable=adaptive_var)
+    adaptive_check.pack(pady=5)
+    motion_var = tk.BooleanVar(value=False)
+    motion_check = tk.Checkbutton(interval_frame, text="Skip frames without motion", variable=motion_var)
+    motion_check.pack(pady=5)
+
+    # Batch size slider (video frames and image folders)
+    batch_frame = tk.LabelFrame(app, text="Batch Size", padx=10, pady=10)
+    batch_slider = tk.Scale(batch_frame, from_=1, to=16, orient="horizontal", resolution=1)
+    batch_slider.set(batch_size)
+    batch_slider.pack(pady=5)
+    tile_var = tk.BooleanVar(value=False)
+    tile_check = tk.Checkbutton(batch_frame, text=f"Tiled inference ({TILE_SIZE}px tiles, for small distant objects)",
+                                variable=tile_var)
+    tile_check.pack(pady=5)
+
+    # Confidence slider
+    confidence_frame = tk.LabelFrame(app, text="Confidence Threshold", padx=10, pady=10)
+    confidence_slider = tk.Scale(confidence_frame, from_=0.0, to=1.0, orient="horizontal", resolution=0.01)
+    confidence_slider.set(confidence_threshold)
+    confidence_slider.pack(pady=5)
+    tk.Label(confidence_frame, text="Per-class thresholds (e.g. drone=0.35, bird=0.6)").pack()
+    class_threshold_entry = tk.Entry(confidence_frame, width=40)
+    class_threshold_entry.pack(pady=5)
+
+    # Region of interest: rectangles x1,y1,x2,y2 and polygons x1,y1,x2,y2,x3,y3,... separated by ";"
+    roi_frame = tk.LabelFrame(app, text="Region of Interest", padx=10, pady=10)
+    roi_frame.pack(pady=10)
+    tk.Label(roi_frame, text="Rectangles or polygons in pixels, separated by ; (empty: whole frame)").pack()
+    roi_entry = tk.Entry(roi_frame, width=40)
+    roi_entry.pack(pady=5)
+    roi_button = tk.Button(roi_frame, text="Draw Rectangle...", command=draw_roi_rectangle)
+    roi_button.pack(pady=5)
+
+    # Progress bar
+    progress_bar = ttk.Progressbar(app, orient="horizontal", length=400, mode="determinate")
+    progress_bar.pack(pady=20)
+    status_label = tk.Label(app, text="", wraplength=600, justify="center")
+    status_label.pack()
+
+    # Preview of the latest annotated frame
+    preview_frame = tk.LabelFrame(app, text="Preview", padx=10, pady=10)
+    preview_frame.pack(pady=10)
+    preview_label = tk.Label(preview_frame)
+    preview_label.pack()
+    preview_channel = detector.PreviewChannel(max_fps=detector.PREVIEW_FPS, max_size=PREVIEW_SIZE)
+    app.bind("<Map>", set_window_visible)
+    app.bind("<Unmap>", set_window_visible)
+
+    # Submit button
+    submit_button = tk.Button(app, text="Submit", command=run_detection)
+    submit_button.pack(pady=10)
+
+    # Pause/cancel controls for a running detection
+    control_frame = tk.Frame(app)
+    control_frame.pack(pady=5)
+    pause_button = tk.Button(control_frame, text="Pause", command=toggle_pause, state="disabled")
+    pause_button.pack(side="left", padx=5)
+    cancel_button = tk.Button(control_frame, text="Cancel", command=cancel_detection, state="disabled")
+    cancel_button.pack(side="left", padx=5)
+
+    app.protocol("WM_DELETE_WINDOW", on_close)
+    set_mode(mode)  # Shows the option frames of the starting mode
+
+    # Warm up the default model in the background so the first run starts straight away
+    detector.preload_model(weight_file)
+
+    # Start the GUI loop
+    app.mainloop()
@@ -0,0 +1,217 @@
+# Headless benchmark of the detection core. Runs detector.run_detection over synthetic (and optionally
+# sample) videos and image sets for a grid of resolutions, frame intervals, batch sizes and torch thread
+# counts, each configuration in a fresh process, and records frames/sec, per-stage latency, peak RSS and
+# bytes written as JSON:
+#
+#   python benchmark.py --weights yolov8n.pt --output results.json
+#   python benchmark.py --compare before.json after.json
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import detector
+
+SYNTHETIC_SEED = 1234
+SYNTHETIC_FPS = 30
+SYNTHETIC_OBJECTS = 6  # Small moving blobs over a sky gradient, so frames change like real footage
+SYNTHETIC_IMAGES = 24  # Images per resolution for the "images" runs
+DEFAULT_RESOLUTIONS = ["640x360", "1280x720", "1920x1080"]
+# A COCO model finds next to nothing in synthetic blobs at the usual threshold; a low one makes runs save
+# frames, so annotating, encoding and writing are measured too
+DEFAULT_CONFIDENCE = 0.05
+
+
+def _synthetic_frames(width, height, count):
+    # Deterministic frames: vertical sky gradient, sensor noise and a few drifting dark blobs
+    rng = np.random.default_rng(SYNTHETIC_SEED)
+    sky = np.linspace(235, 150, height, dtype=np.float32)[:, None, None] * np.array([1.0, 0.9, 0.75],
+                                                                                      dtype=np.float32)
+    sky = np.broadcast_to(sky, (height, width, 3))
+    positions = rng.uniform([0, 0], [width, height * 0.7], size=(SYNTHETIC_OBJECTS, 2))
+    velocities = rng.uniform(-4, 4, size=(SYNTHETIC_OBJECTS, 2)) * (width / 640)
+    sizes = rng.uniform(3, 14, size=SYNTHETIC_OBJECTS) * (width / 640)
+    for _ in range(count):
+        frame = np.clip(sky + rng.normal(0, 3, size=(height, width, 1)), 0, 255).astype(np.uint8)
+        positions = (positions + velocities) % (width, height)
+        for (x, y), size in zip(positions, sizes):
+            cv2.ellipse(frame, (int(x), int(y)), (int(size * 1.6), int(size)), 0, 0, 360, (40, 40, 45), -1)
+        yield frame
+
+
+def make_synthetic_video(directory, width, height, frames):
+    path = os.path.join(directory, f"synthetic_{width}x{height}_{frames}.mp4")
+    if not os.path.exists(path):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*detector.VIDEO_CODEC), SYNTHETIC_FPS,
+                                 (width, height))
+        for frame in _synthetic_frames(width, height, frames):
+            writer.write(frame)
+        writer.release()
+    return path
+
+
+def make_synthetic_images(directory, width, height):
+    folder = os.path.join(directory, f"synthetic_{width}x{height}_images")
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+        for number, frame in enumerate(_synthetic_frames(width, height, SYNTHETIC_IMAGES)):
+            cv2.imwrite(os.path.join(folder, f"image_{number:04}.jpg"), frame)
+    return folder
+
+
+def _init_benchmark_process(threads):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _run_case(case, weight_file, confidence):
+    # Runs in a fresh process, so the peak RSS is this configuration's alone (model load included)
+    output_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        detector.load_model(weight_file, warm=True)  # Loading and warm-up are not part of the timing
+        settings = detector.make_settings(mode=case["mode"], media_path=case["media"], output_dir=output_dir,
+                                          weight_file=weight_file, frame_interval=case["interval"],
+                                          batch_size=case["batch_size"], confidence_threshold=confidence,
+                                          skip_processed=False)
+        started = time.perf_counter()
+        summary = detector.run_detection(settings, lambda kind, payload=None: None, detector.RunControl())
+        wall = time.perf_counter() - started
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    performance = summary["performance"]
+    return {"wall_seconds": round(wall, 3), "frames": performance["frames"],
+            "fps": round(performance["frames"] / wall, 2) if wall > 0 else None,
+            "saved": summary["saved"], "bytes_written": summary["writer"]["bytes"],
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "stages": performance["stages"]}
+
+
+def _case_key(case):
+    return (f"{case['mode']}:{os.path.basename(case['media'])}:interval={case['interval']}:"
+            f"batch={case['batch_size']}:threads={case['threads']}")
+
+
+def build_cases(args, directory):
+    media = []
+    for resolution in args.resolutions:
+        width, height = (int(value) for value in resolution.lower().split("x"))
+        media.append(("video", make_synthetic_video(directory, width, height, args.frames)))
+        if args.images:
+            media.append(("images", make_synthetic_images(directory, width, height)))
+    for path in args.media:
+        media.append(("images" if os.path.isdir(path) else "video", path))
+
+    cases = []
+    for (mode, path), interval, batch_size, threads in itertools.product(media, args.intervals, args.batch_sizes,
+                                                                         args.threads):
+        if mode == "images" and interval != args.intervals[0]:
+            continue  # The frame interval only applies to videos
+        cases.append({"mode": mode, "media": path, "interval": interval, "batch_size": batch_size,
+                      "threads": threads})
+    return cases
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    versions = {"python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__}
+    for package in ("torch", "ultralytics"):
+        try:
+            versions[package] = __import__(package).__version__
+        except ImportError:
+            pass
+    return {"commit": commit, "date": datetime.now().isoformat(timespec="seconds"), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "versions": versions}
+
+
+def command_benchmark(args):
+    directory = args.media_dir or os.path.join(tempfile.gettempdir(), "detector_benchmark_media")
+    os.makedirs(directory, exist_ok=True)
+    cases = build_cases(args, directory)
+    context = multiprocessing.get_context("spawn")
+
+    results = []
+    for number, case in enumerate(cases, 1):
+        runs = []
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_benchmark_process,
+                                     initargs=(case["threads"],)) as pool:
+                runs.append(pool.submit(_run_case, case, args.weights, args.conf).result())
+        # The run with the median throughput represents the configuration
+        run = sorted(runs, key=lambda item: item["fps"] or 0)[len(runs) // 2]
+        results.append(dict(case, key=_case_key(case), repeats=len(runs), **run))
+        print(f"[{number}/{len(cases)}] {_case_key(case)}: {run['fps']} fps, "
+              f"{run['peak_rss_mb']} MB peak RSS", file=sys.stderr)
+
+    document = {"environment": _environment(), "weights": args.weights, "confidence": args.conf,
+                "frames": args.frames, "results": results}
+    with open(args.output, "w") as file:
+        json.dump(document, file, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def command_compare(args):
+    with open(args.compare[0]) as file:
+        before = {row["key"]: row for row in json.load(file)["results"]}
+    with open(args.compare[1]) as file:
+        after = {row["key"]: row for row in json.load(file)["results"]}
+    print(f"{'configuration':<70} {'fps before':>10} {'fps after':>10} {'change':>8}  peak RSS MB")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = f"{(new['fps'] / old['fps'] - 1) * 100:+.1f}%" if old["fps"] and new["fps"] else "-"
+        print(f"{key:<70} {old['fps'] or 0:>10.1f} {new['fps'] or 0:>10.1f} {change:>8}  "
+              f"{old['peak_rss_mb']:.0f} -> {new['peak_rss_mb']:.0f}")
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key:<70} only in {'before' if key in before else 'after'}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the detection core.")
+    parser.add_argument("--weights", default="yolov8n.pt", help="model to run (default: %(default)s)")
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONFIDENCE,
+                        help="confidence threshold (default: %(default)s)")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, metavar="WxH",
+                        help="synthetic video resolutions (default: %(default)s)")
+    parser.add_argument("--frames", type=int, default=120, help="frames per synthetic video (default: %(default)s)")
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 5], help="frame intervals (default: 1 5)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4], help="batch sizes (default: 1 4)")
+    parser.add_argument("--threads", nargs="+", type=int, default=[0],
+                        help="torch thread counts, 0 for the torch default (default: 0)")
+    parser.add_argument("--images", action="store_true", help="also benchmark folders of synthetic images")
+    parser.add_argument("--media", nargs="+", default=[], help="sample videos or image folders to include")
+    parser.add_argument("--media-dir", help="where synthetic media is generated and cached (default: temp dir)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per configuration; the median is kept")
+    parser.add_argument("--output", default="benchmark_results.json", help="results file (default: %(default)s)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two results files instead of running")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.compare:
+        return command_compare(args)
+    return command_benchmark(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2136 @@
+import argparse
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from motion import MotionGate
+from progress import ProgressMeter, format_progress
+from roi import RegionOfInterest, parse_regions
+from tiling import merge_boxes, tile_windows
+from timing import StageTimer
+from tracking import IoUTracker, box_iou
+import os
+from datetime import datetime
+import csv
+import glob
+import json
+import math
+import multiprocessing
+import queue
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# From this frame interval on, jump between sampled frames with a seek instead of
+# grabbing every frame in between (a seek costs roughly one keyframe-to-target decode)
+SEEK_MIN_INTERVAL = 50
+
+# Pipeline sizing: decoded batches buffered ahead of the model, and the number of
+# threads / in-flight frames in the annotate-and-encode writer stage
+PREFETCH_BATCHES = 2
+WRITER_THREADS = min(4, os.cpu_count() or 1)
+WRITER_QUEUE_SIZE = 16
+
+# Saved image formats and their file extensions; PNG is lossless and ignores image_quality
+IMAGE_FORMATS = {"jpg": ".jpg", "webp": ".webp", "png": ".png"}
+PNG_COMPRESSION = 3  # 0-9, higher is smaller but slower to encode
+
+# Video output instead of individual images: one detections.mp4, or short event clips
+VIDEO_OUTPUTS = ("frames", "video", "clips")
+VIDEO_CODEC = "mp4v"
+DETECTIONS_VIDEO = "detections.mp4"
+
+# Image batch mode: recognised extensions, decoder threads and the list of inputs already done
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+DECODE_THREADS = min(4, os.cpu_count() or 1)
+PROCESSED_MANIFEST = "processed_images.txt"
+
+# Job queue mode: videos processed concurrently by a pool of worker processes
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".wmv")
+JOBS_REPORT = "jobs_report.csv"
+JOB_REPORT_FIELDS = ["Video", "Status", "Frames Saved", "Output Directory", "Error"]
+JOB_PROGRESS_INTERVAL = 0.5  # Seconds between progress messages sent back by a job process
+JOB_POLL_INTERVAL = 0.2
+
+# Minimum seconds between progress lines printed by the command-line runner
+CONSOLE_PROGRESS_INTERVAL = 1.0
+# What the progress count of each mode counts, for ETA/rate readouts
+PROGRESS_UNITS = {"video": "frames", "stream": "frames", "image": "images", "images": "images", "jobs": "videos"}
+
+# Number of loaded models kept in memory across runs (least recently used is evicted)
+MODEL_CACHE_SIZE = 3
+
+# Inference backends: "pytorch" runs .pt weights directly, the others run a copy exported next to them
+BACKEND_PRECISIONS = {"pytorch": ("fp32",), "onnx": ("fp32", "int8"), "openvino": ("fp32", "fp16", "int8")}
+COMPARE_IOU = 0.5  # Boxes of one class overlapping this much count as the same detection in "compare"
+WARM_UP_SIZE = 640  # Side of the blank image used for warm-up inference
+
+# GUI preview: at most this many frames per second, shrunk to fit this size
+PREVIEW_FPS = 10
+PREVIEW_SIZE = (800, 600)
+
+# Per-stage timings and throughput of a run, written next to detection_report.csv
+PERFORMANCE_NAME = "performance.json"
+
+# Live streams: per-frame latency log, and how long the model waits for a new frame before
+# checking for pause/cancel again
+LATENCY_NAME = "latency_report.csv"
+LATENCY_FIELDS = ["Frame", "Time", "Latency ms", "Detections", "Dropped"]
+STREAM_POLL_INTERVAL = 0.2
+
+# detection_report.csv: one row per kept box, appended while the run progresses
+REPORT_NAME = "detection_report.csv"
+REPORT_FIELDS = ["Frame", "Time", "Path", "Class", "Confidence", "X1", "Y1", "X2", "Y2"]
+REPORT_FLUSH_ROWS = 200
+REPORT_FLUSH_SECONDS = 5.0
+
+# events.csv: one row per tracked object when tracking is on
+EVENTS_NAME = "events.csv"
+EVENT_FIELDS = ["Track", "Class", "First Frame", "First Time", "Last Frame", "Last Time", "Frames Seen",
+                "Best Confidence", "Best Frame", "Path"]
+
+# Tiled inference: crops sent through the model per predict() call, and the intersection-over-smaller
+# overlap at which two boxes of one class from different tiles are merged
+TILE_BATCH_SIZE = 16
+TILE_MERGE_THRESHOLD = 0.6
+
+# Regions of interest for a video or image can be kept next to it as <name>.roi.txt, one region per line
+ROI_SUFFIX = ".roi.txt"
+
+# Optional columnar copy of the report (needs pyarrow), written one row group at a time
+PARQUET_NAME = "detections.parquet"
+PARQUET_ROW_GROUP_ROWS = 50000
+
+# Box colours (BGR) for annotated output, cycled by class id
+BOX_COLORS = [(56, 56, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72), (23, 204, 146),
+              (134, 219, 61), (211, 188, 0), (255, 115, 100), (236, 24, 0)]
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Boxes kept for one frame as plain arrays: xyxy (N, 4) in frame pixels, conf (N,), cls (N,) int
+Detections = namedtuple("Detections", ["xyxy", "conf", "cls"])
+
+# Settings understood by run_detection; callers override them through make_settings()
+DEFAULT_SETTINGS = {
+    "mode": "video",  # "video", "image" (one file), "images" (folders, globs, file lists), "jobs" (many videos)
+    # or "stream" (live RTSP/HTTP URL, camera number, or a video file played back in real time)
+    "media_path": None,  # In "images"/"jobs" mode a path/pattern or a list of them
+    "output_dir": None,
+    "weight_file": None,
+    "frame_interval": 1,  # Process every Nth frame in video mode
+    "sample_seconds": None,  # If set, process one frame every N seconds of video instead
+    "confidence_threshold": 0.5,
+    "class_thresholds": {},  # Per-class overrides of confidence_threshold, by class name or id
+    "classes": None,  # Only detect these classes (names or ids); None keeps every class
+    "tile_size": 0,  # Split frames into overlapping tiles of this many pixels for small objects; 0 is off
+    "tile_overlap": 0.2,  # Fraction of a tile shared with its neighbour
+    "tile_full_frame": True,  # Also run the whole frame once per tile set, for objects larger than a tile
+    "roi": None,  # Regions of interest in frame pixels: (x1, y1, x2, y2) rectangles and/or [(x, y), ...] polygons
+    "backend": "pytorch",  # "pytorch", or "onnx"/"openvino" to export .pt weights once and run the export
+    "precision": "fp32",  # Exported model precision: "fp32", "fp16" (OpenVINO) or "int8"
+    "batch_size": 4,  # Video frames / images sent through the model per predict() call
+    "image_format": "jpg",  # Saved frames: "jpg", "webp" or "png"
+    "image_quality": 95,  # JPEG/WebP quality, 1-100
+    "output_scale": 1.0,  # Downscale saved frames, e.g. 0.5 for half size
+    "save_raw": False,  # Save the unannotated frame plus a .json sidecar with the boxes
+    "video_output": "frames",  # Video mode: "frames" (one image each), "video" (one clip) or "clips" (per event)
+    "clip_padding": 1.0,  # "clips": seconds of video kept before and after each burst of detections
+    "track": False,  # Video mode: group detections into tracks, one event (and one saved frame) per track
+    "track_iou": 0.3,  # Minimum IoU for a box to continue a track
+    "track_max_gap": 1.0,  # Seconds a track may go undetected before its event is closed
+    "adaptive_sampling": False,  # Video mode: sample every frame for a while after each detection
+    "adaptive_window_seconds": 2.0,  # How long sampling stays dense after a detection before decaying
+    "adaptive_max_fps": 0,  # Cap on dense sampling, frames per second of video; 0 samples every frame
+    "motion_gate": False,  # Video mode: skip inference on frames without scene change
+    "motion_threshold": 0.002,  # Fraction of pixels that must change for a frame to be inferred
+    "motion_force_seconds": 5.0,  # Infer at least this often (seconds of video) even without motion
+    "stream_seconds": None,  # "stream" mode: stop after this many seconds; None runs until cancelled
+    "max_saved_frames": None,  # Stop a video after this many frames with detections; None for no limit
+    "parquet": False,  # Also write detections.parquet next to detection_report.csv
+    "resume_dir": None,  # Video mode: earlier output_<timestamp> folder to continue after an interruption
+    "skip_processed": True,  # "images" mode: skip inputs listed in the output's processed_images.txt
+    "job_workers": 2,  # "jobs" mode: videos processed in parallel, each process with its own model
+}
+
+
+class DetectionError(Exception):
+    # Raised for expected failures (bad input, unreadable model) with a user-facing message
+    pass
+
+
+class RunControl:
+    # Cancel/pause flags shared between the controlling UI and a running detection.
+    # Pass multiprocessing Manager events to share one control between processes.
+
+    def __init__(self, cancelled=None, running=None):
+        self._cancelled = cancelled if cancelled is not None else threading.Event()
+        self._running = running if running is not None else threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Wake up a paused run so it can exit
+
+    def checkpoint(self):
+        # Blocks while paused; returns False once the run has been cancelled
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+
+# Loaded models keyed by (absolute path, mtime, size), so edited weights are reloaded
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+# Weight names that weren't local files when loaded (e.g. "yolov8n.pt", which Ultralytics downloads
+# on demand) -> the file Ultralytics resolved them to
+_resolved_weights = {}
+
+
+def _model_key(weight_file):
+    try:
+        stat = os.stat(weight_file)
+    except OSError:
+        resolved = _resolved_weights.get(weight_file)
+        if resolved is None:
+            return weight_file, None, None
+        return _model_key(resolved)
+    return os.path.abspath(weight_file), stat.st_mtime_ns, stat.st_size
+
+
+def warm_up(model):
+    # One blank inference so fusing and first allocations aren't paid by the first real frame
+    model.predict(source=np.zeros((WARM_UP_SIZE, WARM_UP_SIZE, 3), dtype=np.uint8), verbose=False)
+
+
+def load_model(weight_file, warm=False):
+    # Returns a cached YOLO model, loading (and optionally warming up) the weights on first use.
+    # Loads are serialised so a run waits for a background preload instead of loading twice.
+    key = _model_key(weight_file)
+    with _model_cache_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            model = YOLO(weight_file, task="detect")
+            if warm:
+                warm_up(model)
+            if key[1] is None:
+                # Keyed by the downloaded file, which is what the next lookup of this name finds
+                resolved = getattr(model, "ckpt_path", None)
+                if resolved and os.path.isfile(resolved):
+                    _resolved_weights[weight_file] = resolved
+                    key = _model_key(resolved)
+            _model_cache[key] = model
+            while len(_model_cache) > MODEL_CACHE_SIZE:
+                _model_cache.popitem(last=False)
+        _model_cache.move_to_end(key)
+        return model
+
+
+def exported_path(weight_file, backend, precision="fp32"):
+    # Where the export of .pt weights for a backend is cached, e.g. best_int8.onnx or best_openvino_model/.
+    # Ultralytics recognises OpenVINO models by the _openvino_model folder suffix.
+    base = os.path.splitext(weight_file)[0] + ("" if precision == "fp32" else f"_{precision}")
+    return base + ".onnx" if backend == "onnx" else base + "_openvino_model"
+
+
+def _quantize_onnx(source, target):
+    # Dynamic INT8 quantisation with ONNX Runtime; Ultralytics reads the class names and input size
+    # from the model metadata, which quantisation drops, so it's copied over
+    try:
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        raise DetectionError("INT8 ONNX export needs onnx and onnxruntime (pip install onnx onnxruntime).")
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(onnx.load(source).metadata_props)
+    onnx.save(quantized, target)
+
+
+_export_lock = threading.Lock()
+
+
+def export_model(weight_file, backend, precision="fp32", data=None):
+    # Exports .pt weights for an ONNX Runtime or OpenVINO backend and returns the exported model's path.
+    # Exports are cached next to the weights and redone only when the .pt file is newer. data is the
+    # dataset YAML used to calibrate OpenVINO INT8 (Ultralytics falls back to a small sample set).
+    if precision not in BACKEND_PRECISIONS.get(backend, ()):
+        raise DetectionError(f"Unsupported backend/precision '{backend}'/'{precision}'; use one of: "
+                             + ", ".join(f"{name}/{value}" for name, values in BACKEND_PRECISIONS.items()
+                                         for value in values))
+    if backend == "pytorch":
+        return weight_file
+    target = exported_path(weight_file, backend, precision)
+    with _export_lock:
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weight_file):
+            return target
+        # Exported in a scratch folder: Ultralytics names every OpenVINO variant best_openvino_model,
+        # which would overwrite the cached FP32 export
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(target))) as scratch:
+            try:
+                model = YOLO(shutil.copy2(weight_file, scratch), task="detect")
+                if backend == "onnx":
+                    exported = model.export(format="onnx")
+                    if precision == "int8":
+                        quantized = os.path.join(scratch, "int8.onnx")
+                        _quantize_onnx(exported, quantized)
+                        exported = quantized
+                else:
+                    options = {"half": precision == "fp16", "int8": precision == "int8"}
+                    if data and precision == "int8":
+                        options["data"] = data
+                    exported = model.export(format="openvino", **options)
+            except DetectionError:
+                raise
+            except Exception as e:
+                raise DetectionError(f"Could not export the model for {backend} ({precision}): {e}")
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(exported, target)
+    return target
+
+
+def model_weights(settings):
+    # The weights a run loads: .pt weights exported for the selected backend, or an exported model
+    # (.onnx file, *_openvino_model folder or the .xml inside one) picked directly
+    weight_file = settings["weight_file"]
+    if weight_file.endswith(".xml") and os.path.dirname(weight_file).endswith("_openvino_model"):
+        return os.path.dirname(weight_file)
+    if weight_file.endswith(".pt") and settings["backend"] != "pytorch":
+        return export_model(weight_file, settings["backend"], settings["precision"])
+    return weight_file
+
+
+def preload_model(weight_file):
+    # Loads and warms up weights on a background thread, e.g. right after they are selected.
+    # Failures are ignored here; the run itself reports them.
+    def preload():
+        try:
+            load_model(weight_file, warm=True)
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=preload, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def _sync_control(source, target):
+    # Copies the pause/cancel state of one RunControl onto another
+    if source.cancelled:
+        if not target.cancelled:
+            target.cancel()
+    elif source.paused != target.paused:
+        if source.paused:
+            target.pause()
+        else:
+            target.resume()
+
+
+def make_settings(**overrides):
+    unknown = set(overrides) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown detection settings: {', '.join(sorted(unknown))}")
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(overrides)
+    return settings
+
+
+def format_timestamp(milliseconds):
+    # HH:MM:SS.mmm position in the video
+    total_ms = int(round(milliseconds))
+    hours, rest = divmod(total_ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, ms = divmod(rest, 1000)
+    return f"{hours:02}:{minutes:02}:{seconds:02}.{ms:03}"
+
+
+def detection_rows(frame, milliseconds, path, detections, names):
+    time = "N/A" if milliseconds is None else format_timestamp(milliseconds)
+    rows = []
+    for (x1, y1, x2, y2), conf, cls in zip(detections.xyxy.tolist(), detections.conf.tolist(),
+                                           detections.cls.tolist()):
+        rows.append({"Frame": frame, "Time": time, "Path": path, "Class": names.get(cls, cls),
+                     "Confidence": f"{conf:.4f}", "X1": f"{x1:.1f}", "Y1": f"{y1:.1f}", "X2": f"{x2:.1f}",
+                     "Y2": f"{y2:.1f}"})
+    return rows
+
+
+def _free_path(path):
+    # path, or path with _1, _2, ... before the extension if it already exists
+    base, extension = os.path.splitext(path)
+    number = 0
+    while os.path.exists(path):
+        number += 1
+        path = f"{base}_{number}{extension}"
+    return path
+
+
+class ParquetReportWriter:
+    # Columnar twin of the CSV report: one row per box with typed columns (frame, pts_ms,
+    # class_id, class_name, confidence, x1..y2, path). Boxes are kept as numpy chunks and
+    # written as one row group per PARQUET_ROW_GROUP_ROWS rows. The file is only readable once
+    # closed (Parquet keeps its footer at the end); a resumed run writes detections_1.parquet etc.
+
+    def __init__(self, directory):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise DetectionError("Parquet output needs pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self.path = _free_path(os.path.join(directory, PARQUET_NAME))
+        self._schema = pa.schema([
+            ("frame", pa.int64()),
+            ("pts_ms", pa.float64()),
+            ("class_id", pa.int32()),
+            ("class_name", pa.dictionary(pa.int32(), pa.string())),
+            ("confidence", pa.float32()),
+            ("x1", pa.float32()),
+            ("y1", pa.float32()),
+            ("x2", pa.float32()),
+            ("y2", pa.float32()),
+            ("path", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._chunks = []
+        self._rows = 0
+        self._class_names = None
+
+    def add(self, frame, milliseconds, path, detections, names):
+        if not len(detections.conf):
+            return
+        if self._class_names is None:
+            self._class_names = [str(names.get(cls, cls)) for cls in range(max(names) + 1)]
+        self._chunks.append((frame, milliseconds, path, detections))
+        self._rows += len(detections.conf)
+        if self._rows >= PARQUET_ROW_GROUP_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self._chunks:
+            return
+        pa = self._pa
+        counts = [len(detections.conf) for *_, detections in self._chunks]
+        frames = np.repeat([-1 if frame == "N/A" else frame for frame, *_ in self._chunks], counts)
+        pts = np.repeat([np.nan if ms is None else ms for _, ms, *_ in self._chunks], counts)
+        # Transposed so each coordinate column is contiguous
+        x1, y1, x2, y2 = np.ascontiguousarray(
+            np.concatenate([detections.xyxy for *_, detections in self._chunks]).astype(np.float32).T)
+        cls = np.concatenate([detections.cls for *_, detections in self._chunks]).astype(np.int32)
+        conf = np.concatenate([detections.conf for *_, detections in self._chunks]).astype(np.float32)
+        paths = np.repeat(np.array([path for _, _, path, _ in self._chunks], dtype=object), counts)
+
+        table = pa.Table.from_arrays([
+            pa.array(frames, mask=frames < 0),
+            pa.array(pts, mask=np.isnan(pts)),
+            pa.array(cls),
+            pa.DictionaryArray.from_arrays(pa.array(cls), pa.array(self._class_names)),
+            pa.array(conf),
+            pa.array(x1),
+            pa.array(y1),
+            pa.array(x2),
+            pa.array(y2),
+            pa.array(paths, type=pa.string()),
+        ], schema=self._schema)
+        self._writer.write_table(table)
+        self._chunks.clear()
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class ReportWriter:
+    # Appends rows to detection_report.csv as the run goes. Rows are buffered and flushed (and
+    # fsync'ed) every REPORT_FLUSH_ROWS rows or REPORT_FLUSH_SECONDS, so a crash or a closed
+    # window loses at most the last few seconds of the report instead of all of it.
+    # With parquet=True the same boxes also go to a ParquetReportWriter.
+
+    def __init__(self, directory, parquet=False):
+        self._parquet = ParquetReportWriter(directory) if parquet else None
+        self.path = os.path.join(directory, REPORT_NAME)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, mode="a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS)
+        if new_file:
+            self._writer.writeheader()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.boxes = 0  # Boxes added during this run
+
+    def add(self, frame, milliseconds, path, detections, names):
+        # frame/milliseconds are "N/A"/None for still images
+        self.boxes += len(detections.conf)
+        if self._parquet is not None:
+            self._parquet.add(frame, milliseconds, path, detections, names)
+        self._buffer.extend(detection_rows(frame, milliseconds, path, detections, names))
+        if len(self._buffer) >= REPORT_FLUSH_ROWS:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        # Called by the runners on every batch as well, so rows buffered before a stretch
+        # without detections still reach the disk within REPORT_FLUSH_SECONDS
+        if self._buffer and time.monotonic() - self._last_flush >= REPORT_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self._writer.writerows(self._buffer)
+        self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EventWriter:
+    # events.csv: one row per finished track, flushed as each event closes (events are rare)
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, EVENTS_NAME)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, mode="a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=EVENT_FIELDS)
+        if new_file:
+            self._writer.writeheader()
+
+    def add(self, track, names, path):
+        best_frame = track.best_frame[0]
+        self._writer.writerow({"Track": track.id, "Class": names.get(track.cls, track.cls),
+                               "First Frame": track.first_frame, "First Time": format_timestamp(track.first_ms),
+                               "Last Frame": track.last_frame, "Last Time": format_timestamp(track.last_ms),
+                               "Frames Seen": track.hits, "Best Confidence": f"{track.best_conf:.4f}",
+                               "Best Frame": best_frame, "Path": path or ""})
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def write_performance(directory, mode, timer, wall_seconds, frames, writer_stats):
+    # Saves the run's per-stage timings and throughput as performance.json and returns them
+    performance = {"mode": mode, "wall_seconds": round(wall_seconds, 3), "frames": frames,
+                   "fps": round(frames / wall_seconds, 2) if wall_seconds > 0 else None,
+                   "stages": timer.summary(), "writer": writer_stats}
+    with open(os.path.join(directory, PERFORMANCE_NAME), "w") as file:
+        json.dump(performance, file, indent=2)
+    return performance
+
+
+def format_performance(performance, stages=("decode", "predict", "filter", "annotate", "encode", "write")):
+    # One-line digest of write_performance()'s output, e.g. for a status bar
+    parts = [f"{performance['frames']} frames in {performance['wall_seconds']:.1f}s"]
+    if performance["fps"]:
+        parts[0] += f" ({performance['fps']:.1f} fps)"
+    for stage in stages:
+        timing = performance["stages"].get(stage)
+        if timing:
+            parts.append(f"{stage} {timing['mean_ms']:.1f}/{timing['p95_ms']:.1f} ms")
+    return "; ".join(parts) + " (mean/p95)"
+
+
+def read_resume_point(directory):
+    # Last reported frame and the number of frames saved so far in an interrupted video run
+    path = os.path.join(directory, REPORT_NAME)
+    if not os.path.exists(path):
+        return -1, 0
+    last_frame, saved = -1, set()
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            if row.get("Frame", "").isdigit():
+                last_frame = max(last_frame, int(row["Frame"]))
+                saved.add(row["Frame"])
+    return last_frame, len(saved)
+
+
+def collect_files(sources, extensions):
+    # Expands directories, glob patterns and .txt file lists into an ordered list of file paths
+    if isinstance(sources, str):
+        sources = [sources]
+
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(os.path.join(source, name) for name in sorted(os.listdir(source))
+                         if name.lower().endswith(extensions))
+        elif any(char in source for char in "*?["):
+            paths.extend(path for path in sorted(glob.glob(source, recursive=True))
+                         if path.lower().endswith(extensions))
+        elif source.lower().endswith(".txt"):
+            with open(source) as file:
+                paths.extend(line.strip() for line in file if line.strip())
+        else:
+            paths.append(source)
+
+    seen, unique = set(), []
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def collect_images(sources):
+    return collect_files(sources, IMAGE_EXTENSIONS)
+
+
+def collect_videos(sources):
+    return collect_files(sources, VIDEO_EXTENSIONS)
+
+
+def _unique_stems(paths):
+    # File name without extension, plus a short path hash when two inputs share a name
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    counts = {}
+    for stem in stems:
+        counts[stem] = counts.get(stem, 0) + 1
+    unique = {}
+    for path, stem in zip(paths, stems):
+        if counts[stem] > 1:
+            stem = f"{stem}_{zlib.crc32(os.path.abspath(path).encode()):08x}"
+        unique[path] = stem
+    return unique
+
+
+def parse_class_thresholds(text):
+    # "drone=0.35, bird=0.6" -> {"drone": 0.35, "bird": 0.6}
+    thresholds = {}
+    for item in text.replace(",", " ").split():
+        name, separator, value = item.partition("=")
+        if not separator or not name:
+            raise ValueError(f"Expected class=threshold, got '{item}'")
+        thresholds[name] = float(value)
+    return thresholds
+
+
+def _class_id(key, names):
+    if isinstance(key, int) or str(key).isdigit():
+        if int(key) in names:
+            return int(key)
+    else:
+        for cls, name in names.items():
+            if name == key:
+                return cls
+    raise DetectionError(f"Unknown class '{key}'. The model knows: {', '.join(names.values())}")
+
+
+def prepare_filter(model, settings):
+    # Builds the per-class threshold table used by filter_detections and the predict() arguments
+    # that let NMS drop boxes which could never pass (below the lowest threshold, or of an unwanted class)
+    names = model.names
+    thresholds = np.full(max(names) + 1, settings["confidence_threshold"], dtype=np.float32)
+    for key, threshold in settings["class_thresholds"].items():
+        thresholds[_class_id(key, names)] = threshold
+
+    # Every argument is always given: Ultralytics keeps the arguments of earlier predict() calls on a
+    # model, and cached models are shared between runs (and with warm-up and "compare")
+    predict_args = {"classes": None, "verbose": True}
+    if settings["classes"]:
+        wanted = sorted({_class_id(key, names) for key in settings["classes"]})
+        unwanted = np.ones(len(thresholds), dtype=bool)
+        unwanted[wanted] = False
+        thresholds[unwanted] = np.inf
+        predict_args["classes"] = wanted
+    predict_args["conf"] = float(thresholds[np.isfinite(thresholds)].min())
+    return thresholds, predict_args
+
+
+def no_detections():
+    return Detections(xyxy=np.empty((0, 4), dtype=np.float32), conf=np.empty(0, dtype=np.float32),
+                      cls=np.empty(0, dtype=np.int64))
+
+
+def filter_detections(result, thresholds):
+    # One vectorised mask over the boxes tensor: keep boxes whose confidence reaches their class threshold
+    boxes = result.boxes.cpu().numpy()
+    cls = boxes.cls.astype(np.int64)
+    keep = boxes.conf >= thresholds[cls]
+    return Detections(xyxy=boxes.xyxy[keep], conf=boxes.conf[keep], cls=cls[keep])
+
+
+def load_roi(settings):
+    # The run's regions of interest, or for a single video/image without any, the regions in a
+    # <name>.roi.txt file next to it (so every camera in a job queue can have its own)
+    if settings["roi"]:
+        return RegionOfInterest(settings["roi"])
+    if settings["mode"] in ("video", "image"):
+        sidecar = os.path.splitext(settings["media_path"])[0] + ROI_SUFFIX
+        if os.path.exists(sidecar):
+            with open(sidecar) as file:
+                try:
+                    return RegionOfInterest(parse_regions(file.read().replace("\n", ";")))
+                except ValueError as e:
+                    raise DetectionError(f"Could not read {sidecar}: {e}")
+    return None
+
+
+def _predict(model, images, predict_args, timer):
+    # model.predict(), timed per call together with the per-image Ultralytics speeds
+    if timer is None:
+        return model.predict(source=images, **predict_args)
+    with timer.time("predict"):
+        results = model.predict(source=images, **predict_args)
+    for result in results:
+        for stage, milliseconds in result.speed.items():
+            if milliseconds is not None:
+                timer.add(f"ultralytics_{stage}", milliseconds / 1000)
+    return results
+
+
+def detect(model, images, thresholds, predict_args, settings, roi=None, timer=None):
+    # Runs the model over a list of images and returns the filtered Detections of each. With a region
+    # of interest, images are cropped to its bounding box first and boxes outside it are dropped. With
+    # tiling, every image is cut into overlapping tiles, all tiles go through the model in batches, and
+    # the boxes are shifted back to image coordinates and merged across tile borders.
+    if not images:
+        return []
+    tile_size = settings["tile_size"]
+    if not tile_size and roi is None:
+        results = _predict(model, images, predict_args, timer)
+        started = time.perf_counter()
+        detections = [filter_detections(result, thresholds) for result in results]
+        if timer is not None:
+            timer.add("filter", time.perf_counter() - started)
+        return detections
+
+    crops, owners, offsets = [], [], []
+    for number, image in enumerate(images):
+        height, width = image.shape[:2]
+        bounds = roi.bounds(width, height) if roi else (0, 0, width, height)
+        if bounds is None:
+            continue
+        left, top, right, bottom = bounds
+        windows = [(0, 0, right - left, bottom - top)]
+        if tile_size:
+            regions = None
+            if roi:
+                regions = [(x1 - left, y1 - top, x2 - left, y2 - top)
+                           for x1, y1, x2, y2 in roi.rectangles(width, height)]
+            tiles = tile_windows(right - left, bottom - top, tile_size, settings["tile_overlap"], regions)
+            windows = tiles + windows if settings["tile_full_frame"] and windows[0] not in tiles else tiles
+        for x1, y1, x2, y2 in windows:
+            crops.append(image[top + y1:top + y2, left + x1:left + x2])  # A view, not a copy
+            owners.append(number)
+            offsets.append(np.array([left + x1, top + y1, left + x1, top + y1], dtype=np.float32))
+
+    parts = [[] for _ in images]
+    batch = TILE_BATCH_SIZE if tile_size else max(1, len(crops))
+    filter_seconds = 0.0
+    for start in range(0, len(crops), batch):
+        results = _predict(model, crops[start:start + batch], predict_args, timer)
+        filter_started = time.perf_counter()
+        for number, result in enumerate(results, start):
+            detections = filter_detections(result, thresholds)
+            if len(detections.conf):
+                parts[owners[number]].append(detections._replace(xyxy=detections.xyxy + offsets[number]))
+        filter_seconds += time.perf_counter() - filter_started
+
+    filter_started = time.perf_counter()
+    merged = []
+    for image, image_parts in zip(images, parts):
+        if not image_parts:
+            merged.append(no_detections())
+            continue
+        xyxy, conf, cls = (np.concatenate(column) for column in zip(*image_parts))
+        keep = merge_boxes(xyxy, conf, cls, TILE_MERGE_THRESHOLD) if len(image_parts) > 1 else slice(None)
+        detections = Detections(xyxy=xyxy[keep], conf=conf[keep], cls=cls[keep])
+        if roi:
+            height, width = image.shape[:2]
+            inside = roi.contains(detections.xyxy, width, height)
+            detections = Detections(*(column[inside] for column in detections))
+        merged.append(detections)
+    if timer is not None:
+        timer.add("filter", filter_seconds + time.perf_counter() - filter_started)
+    return merged
+
+
+def draw_detections(frame, detections, names):
+    # Lightweight stand-in for Results.plot(): draws only the kept boxes, straight onto a copy
+    # of the frame with OpenCV (no PIL round trip, no masks/keypoints handling)
+    annotated = frame.copy()
+    thickness = max(1, round(sum(frame.shape[:2]) / 1000))  # Line width grows with resolution
+    font_scale = thickness / 3
+    boxes = detections.xyxy.round().astype(np.int32).tolist()
+    for (x1, y1, x2, y2), conf, cls in zip(boxes, detections.conf.tolist(), detections.cls.tolist()):
+        color = BOX_COLORS[cls % len(BOX_COLORS)]
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, thickness)
+
+        label = f"{names.get(cls, cls)} {conf:.2f}"
+        (width, height), baseline = cv2.getTextSize(label, LABEL_FONT, font_scale, thickness)
+        top = max(y1, height + baseline)  # Keep the label inside the frame
+        cv2.rectangle(annotated, (x1, top - height - baseline), (x1 + width, top), color, -1)
+        cv2.putText(annotated, label, (x1, top - baseline), LABEL_FONT, font_scale, (255, 255, 255),
+                    max(1, thickness - 1), cv2.LINE_AA)
+    return annotated
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once the pipeline is being torn down
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# Queued by the decoder when it takes a rewind request from an AdaptiveSampler; seeked is False when
+# it couldn't go back, in which case the frames queued in the meantime are still valid
+Rewind = namedtuple("Rewind", "seeked")
+
+
+class AdaptiveSampler:
+    # Frame steps for adaptive sampling: sparse (the normal interval) while nothing is detected, dense
+    # for a window of frames after a detection, then doubling back up to sparse one window at a time.
+    # The decoder thread asks for steps; the inference thread reports detections.
+    # Detections are only known once the decoder has prefetched well past them, so a detection made
+    # while sampling sparsely asks the decoder to seek back and sample the window after it densely.
+
+    def __init__(self, sparse, dense, window):
+        self.sparse = sparse
+        self.dense = min(dense, sparse)
+        self.window = max(1, window)
+        self._last_hit = None
+        self._rewind = None
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def _step(self, frame_count):
+        if self._last_hit is None:
+            return self.sparse
+        windows = max(0, frame_count - self._last_hit) // self.window
+        return min(self.sparse, self.dense << min(windows, 30))
+
+    def notify(self, frame_count):
+        # True when the frames after this one were sampled more sparsely than dense, so the decoder
+        # has been asked to go back to them
+        with self._lock:
+            if self._last_hit is not None and frame_count <= self._last_hit:
+                return False
+            rewind = self._step(frame_count) > self.dense and not self._finished
+            self._last_hit = frame_count
+            if rewind:
+                self._rewind = frame_count + self.dense
+            return rewind
+
+    @property
+    def rewind_pending(self):
+        return self._rewind is not None
+
+    def finish(self):
+        # Called by the decoder as it stops; no rewind can be answered after this
+        with self._lock:
+            self._finished = True
+            self._rewind = None
+
+    def take_rewind(self):
+        # For the decoder: the frame to go back to, or None
+        with self._lock:
+            rewind, self._rewind = self._rewind, None
+            return rewind
+
+    def step(self, frame_count):
+        with self._lock:
+            return self._step(frame_count)
+
+
+def _decode_video(cap, start_frame, frame_interval, total_frames, frames, emit, control, stop, sampler=None,
+                  timer=None):
+    # Producer stage: walks the video and queues sampled frames as (frame_count, milliseconds, frame).
+    # Frames are taken every frame_interval, or at the steps an AdaptiveSampler gives. Long steps seek
+    # instead of grabbing every frame in between. A rewind asked for by the sampler is answered with a
+    # Rewind marker. Ends with None, or with the exception that stopped it.
+    frame_count = start_frame
+    next_sample = -(-start_frame // frame_interval) * frame_interval  # First multiple at or after the start
+    decode_started = time.perf_counter()  # "decode" covers grabbing the skipped frames too
+    try:
+        while cap.isOpened() and not stop.is_set():
+            if not control.checkpoint():
+                break
+
+            rewind = sampler.take_rewind() if sampler else None
+            if rewind is not None:
+                seeked = frame_count > rewind and cap.set(cv2.CAP_PROP_POS_FRAMES, rewind)
+                if seeked:
+                    frame_count = rewind
+                next_sample = max(rewind, frame_count)
+                if not _put(frames, Rewind(bool(seeked)), stop):
+                    break
+
+            # grab() only advances the stream; frames that are skipped never get
+            # converted to BGR and copied out by retrieve()
+            if not cap.grab():
+                if sampler and sampler.rewind_pending:
+                    continue  # A detection near the end still gets its dense window
+                break
+
+            if frame_count >= next_sample:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if timer is not None:
+                    timer.add("decode", time.perf_counter() - decode_started)
+
+                # Timestamp is taken now, while the capture still points at this frame
+                if not _put(frames, (frame_count, cap.get(cv2.CAP_PROP_POS_MSEC), frame), stop):
+                    break
+
+                decode_started = time.perf_counter()
+                step = sampler.step(frame_count) if sampler else frame_interval
+                next_sample = frame_count + step
+                if step >= SEEK_MIN_INTERVAL and total_frames > 0:
+                    if next_sample >= total_frames:
+                        if sampler and sampler.rewind_pending:
+                            frame_count += 1  # This frame was grabbed; the rewind may not seek
+                            continue
+                        emit("progress", total_frames)
+                        break
+                    if cap.set(cv2.CAP_PROP_POS_FRAMES, next_sample):
+                        frame_count = next_sample
+                        emit("progress", frame_count)
+                        continue
+
+            frame_count += 1
+            emit("progress", frame_count)
+    except Exception as e:
+        if sampler is not None:
+            sampler.finish()
+        _put(frames, e, stop)
+        return
+    if sampler is not None:
+        sampler.finish()
+    _put(frames, None, stop)
+
+
+class FrameWriter:
+    # Writer stage: annotates, encodes and writes saved frames on a small thread pool (OpenCV
+    # releases the GIL while encoding). At most max_pending frames are in flight; submit()
+    # blocks beyond that, which back-pressures the inference stage. Bytes written and time
+    # spent encoding/writing are totalled in `stats`.
+
+    def __init__(self, emit, settings, workers=WRITER_THREADS, max_pending=WRITER_QUEUE_SIZE, timer=None):
+        image_format = settings["image_format"]
+        if image_format not in IMAGE_FORMATS:
+            raise DetectionError(f"Unsupported image format '{image_format}'; use one of: {', '.join(IMAGE_FORMATS)}")
+        self.extension = IMAGE_FORMATS[image_format]
+        if image_format == "jpg":
+            self._params = [cv2.IMWRITE_JPEG_QUALITY, int(settings["image_quality"])]
+        elif image_format == "webp":
+            self._params = [cv2.IMWRITE_WEBP_QUALITY, int(settings["image_quality"])]
+        else:
+            self._params = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+        self._scale = settings["output_scale"]
+        self._save_raw = settings["save_raw"]
+
+        self._emit = emit
+        self._timer = timer
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._errors = []
+        self._stats_lock = threading.Lock()
+        self.stats = {"files": 0, "bytes": 0, "encode_seconds": 0.0, "write_seconds": 0.0}
+
+    def submit(self, frame, detections, names, output_path):
+        # output_path is given without extension; the configured format adds it
+        self._slots.acquire()
+        future = self._pool.submit(self._write, frame, detections, names, output_path)
+        future.add_done_callback(self._done)
+
+    def _write(self, frame, detections, names, output_path):
+        started = time.perf_counter()
+        if self._scale != 1.0:
+            # Shrink before drawing, so the boxes are drawn on (and scaled to) the smaller image
+            frame = cv2.resize(frame, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+            detections = detections._replace(xyxy=detections.xyxy * self._scale)
+        image = frame if self._save_raw else draw_detections(frame, detections, names)
+        drawn_at = time.perf_counter()
+        ok, encoded = cv2.imencode(self.extension, image, self._params)
+        if not ok:
+            raise DetectionError(f"Could not encode {output_path}{self.extension}")
+        encoded_at = time.perf_counter()
+
+        with open(output_path + self.extension, "wb") as file:
+            file.write(encoded)
+        written = encoded.nbytes
+        if self._save_raw:
+            # Boxes in the saved image's pixel coordinates, for re-drawing or training later
+            sidecar = {"width": image.shape[1], "height": image.shape[0], "boxes": [
+                {"class": names.get(cls, cls), "class_id": cls, "confidence": round(conf, 4),
+                 "xyxy": [round(value, 1) for value in box]}
+                for box, conf, cls in zip(detections.xyxy.tolist(), detections.conf.tolist(),
+                                          detections.cls.tolist())]}
+            sidecar_text = json.dumps(sidecar)
+            with open(output_path + ".json", "w") as file:
+                file.write(sidecar_text)
+            written += len(sidecar_text)
+        finished = time.perf_counter()
+
+        with self._stats_lock:
+            self.stats["files"] += 1
+            self.stats["bytes"] += written
+            self.stats["encode_seconds"] += encoded_at - started
+            self.stats["write_seconds"] += finished - encoded_at
+        if self._timer is not None:
+            self._timer.add("annotate", drawn_at - started)
+            self._timer.add("encode", encoded_at - drawn_at)
+            self._timer.add("write", finished - encoded_at)
+        self._emit("preview", image)
+
+    def _done(self, future):
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
+
+
+class ClipWriter:
+    # Writes processed video frames into .mp4 containers instead of one image per frame.
+    # "video": every frame with detections goes into a single detections.mp4.
+    # "clips": a clip opens at a detection (including up to clip_padding seconds of frames
+    # buffered before it) and closes once clip_padding seconds pass without one.
+    # Clip boundaries are decided in submit(), on the inference thread, so the report knows
+    # each frame's file; drawing and encoding run in order on one background thread.
+
+    def __init__(self, emit, settings, directory, fps, max_pending=WRITER_QUEUE_SIZE, timer=None):
+        self._emit = emit
+        self._timer = timer
+        self._directory = directory
+        self._fps = fps
+        self._scale = settings["output_scale"]
+        self._clips = settings["video_output"] == "clips"
+        padding_frames = max(1, math.ceil(settings["clip_padding"] * fps))
+        self._preroll = deque(maxlen=padding_frames)
+        self._post_frames = padding_frames
+        self._gap = 0
+        self._path = None  # Container currently being filled (as seen by the inference thread)
+
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._errors = []
+        self._writer = None
+        self._writer_path = None
+        self.stats = {"files": 0, "bytes": 0, "encode_seconds": 0.0, "write_seconds": 0.0}
+
+    def submit(self, frame, detections, names, index):
+        # Returns the file the frame went into, or None if it was dropped or only buffered
+        if len(detections.conf):
+            if self._path is None:
+                name = DETECTIONS_VIDEO if not self._clips else f"clip_{index:07}.mp4"
+                self._path = _free_path(os.path.join(self._directory, name))
+                self._queue(self._open, self._path)
+                while self._preroll:
+                    self._queue(self._add, self._preroll.popleft(), None, names)
+            self._queue(self._add, frame, detections, names)
+            self._gap = 0
+            return self._path
+
+        if not self._clips:
+            return None
+        if self._path is not None:
+            self._queue(self._add, frame, None, names)
+            self._gap += 1
+            if self._gap > self._post_frames:
+                self._queue(self._close)
+                self._path = None
+        else:
+            self._preroll.append(frame)
+        return None
+
+    def _queue(self, operation, *args):
+        self._slots.acquire()
+        future = self._pool.submit(operation, *args)
+        future.add_done_callback(self._done)
+
+    def _open(self, path):
+        self._close()
+        self._writer_path = path
+
+    def _add(self, frame, detections, names):
+        started = time.perf_counter()
+        if self._scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+            if detections is not None:
+                detections = detections._replace(xyxy=detections.xyxy * self._scale)
+        if detections is not None:
+            frame = draw_detections(frame, detections, names)
+            self._emit("preview", frame)
+        drawn_at = time.perf_counter()
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self._writer_path, cv2.VideoWriter_fourcc(*VIDEO_CODEC), self._fps,
+                                           (width, height))
+            if not self._writer.isOpened():
+                raise DetectionError(f"Could not open {self._writer_path} for writing")
+        self._writer.write(frame)
+        finished = time.perf_counter()
+        self.stats["encode_seconds"] += finished - started
+        if self._timer is not None:
+            self._timer.add("annotate", drawn_at - started)
+            self._timer.add("encode", finished - drawn_at)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self.stats["files"] += 1
+            self.stats["bytes"] += os.path.getsize(self._writer_path)
+            self._writer = None
+
+    def _done(self, future):
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def close(self):
+        self._pool.submit(self._close)
+        self._pool.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
+
+
+def run_video(model, settings, emit, control):
+    if settings["video_output"] not in VIDEO_OUTPUTS:
+        raise DetectionError(f"Unknown video output '{settings['video_output']}'; use one of: "
+                             f"{', '.join(VIDEO_OUTPUTS)}")
+    cap = cv2.VideoCapture(settings["media_path"])
+    if not cap.isOpened():
+        raise DetectionError("Could not open video.")
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    start_frame, saved_count = 0, 0
+    if settings["resume_dir"]:
+        # Pick up after the last frame the interrupted run reported
+        timestamped_dir = settings["resume_dir"]
+        last_frame, saved_count = read_resume_point(timestamped_dir)
+        start_frame = last_frame + 1
+        if start_frame and not cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame):
+            cap.release()
+            raise DetectionError("Could not seek to the resume point in this video.")
+    else:
+        timestamped_dir = os.path.join(settings["output_dir"], datetime.now().strftime("output_%Y%m%d_%H%M%S"))
+    os.makedirs(timestamped_dir, exist_ok=True)
+    emit("start", {"total": total_frames, "output_dir": timestamped_dir})
+    emit("progress", start_frame)
+
+    writer = report = events = None
+    try:
+        frame_interval = max(1, int(settings["frame_interval"]))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if settings["sample_seconds"] and fps > 0:
+            frame_interval = max(1, round(settings["sample_seconds"] * fps))
+        sampler = None
+        if settings["adaptive_sampling"]:
+            # Dense sampling is capped at adaptive_max_fps frames per second of video (0 for every frame)
+            dense = 1
+            if settings["adaptive_max_fps"] and fps > 0:
+                dense = max(1, math.ceil(fps / settings["adaptive_max_fps"]))
+            sampler = AdaptiveSampler(frame_interval, dense,
+                                      math.ceil(settings["adaptive_window_seconds"] * (fps or 30.0)))
+        batch_size = max(1, settings["batch_size"])
+        thresholds, predict_args = prepare_filter(model, settings)
+        roi = load_roi(settings)
+        max_saved = settings["max_saved_frames"] or math.inf
+        timer, started, processed = StageTimer(), time.perf_counter(), 0
+        pending = []  # (frame_count, milliseconds, frame, infer) waiting for the next batched predict
+        held = None  # Frames set aside while an adaptive-sampling rewind is outstanding
+
+        # Frames the motion gate turns away count as frames without detections
+        gate = None
+        if settings["motion_gate"]:
+            gate = MotionGate(settings["motion_threshold"],
+                              max(1, math.ceil(settings["motion_force_seconds"] * (fps or 30.0))))
+
+        # decode thread -> frames (bounded) -> inference (this thread) -> writer pool
+        stop = threading.Event()
+        frames = queue.Queue(maxsize=batch_size * PREFETCH_BATCHES)
+        decoder = threading.Thread(target=_decode_video, name="frame-decoder", daemon=True,
+                                   args=(cap, start_frame, frame_interval, total_frames, frames, emit, control, stop,
+                                         sampler, timer))
+        if settings["video_output"] == "frames":
+            writer = FrameWriter(emit, settings, timer=timer)
+        else:
+            # Output plays back at the rate frames were sampled (the dense rate while sampling adaptively,
+            # since that's what the footage around detections is made of)
+            writer = ClipWriter(emit, settings, timestamped_dir,
+                                (fps or 30.0) / (sampler.dense if sampler else frame_interval), timer=timer)
+        report = ReportWriter(timestamped_dir, parquet=settings["parquet"])
+
+        # With tracking, repeated detections of one object collapse into a single event; in
+        # "frames" output only the best frame of each track is saved
+        tracker, events = None, None
+        if settings["track"]:
+            tracker = IoUTracker(settings["track_iou"], max(1, math.ceil(settings["track_max_gap"] * (fps or 30.0))))
+            events = EventWriter(timestamped_dir)
+    except BaseException:
+        # Nothing is running yet; close whatever was opened before passing the error on
+        for opened in (events, report, writer):
+            if opened is not None:
+                opened.close()
+        cap.release()
+        raise
+
+    def close_tracks(tracks, names):
+        nonlocal saved_count
+        for track in tracks:
+            output_path = None
+            if isinstance(writer, FrameWriter):
+                index, milliseconds, frame, detections, position = track.best_frame
+                output_name = os.path.join(timestamped_dir, f"track_{track.id:05}_{index:07}")
+                output_path = output_name + writer.extension
+                writer.submit(frame, detections, names, output_name)
+                saved_count += 1
+                report.add(index, milliseconds, output_path,
+                           Detections(*(column[position:position + 1] for column in detections)), names)
+            events.add(track, names, output_path)
+
+    def flush_batch():
+        nonlocal saved_count, processed, held
+        batch = [frame for _, _, frame, infer in pending if infer]
+        results = iter(detect(model, batch, thresholds, predict_args, settings, roi, timer))
+        names = model.names
+        rewound = False
+        for position, (index, milliseconds, frame, infer) in enumerate(pending):
+            if saved_count >= max_saved or rewound:
+                break
+
+            # Only frames that will be saved get annotated, and only with the boxes that passed
+            detections = next(results) if infer else no_detections()
+            if sampler is not None and len(detections.conf) and sampler.notify(index):
+                # The rest of the batch, and whatever arrives before the decoder's Rewind marker,
+                # waits to see whether the decoder went back to sample these frames densely
+                held = pending[position + 1:]
+                rewound = True
+
+            processed += 1
+            if tracker is not None:
+                close_tracks(tracker.update(index, milliseconds, frame, detections), names)
+                if isinstance(writer, FrameWriter):
+                    continue  # Saved once its track ends, from the track's best frame
+
+            if isinstance(writer, ClipWriter):
+                # Clips also take frames without detections (as context around events)
+                output_path = writer.submit(frame, detections, names, index)
+                if len(detections.conf):
+                    saved_count += 1
+                    report.add(index, milliseconds, output_path, detections, names)
+            elif len(detections.conf):
+                seconds = int((milliseconds / 1000) % 60)
+                minutes = int((milliseconds / (1000 * 60)) % 60)
+                output_name = os.path.join(timestamped_dir, f"{minutes:02}_{seconds:02}_{index:04}")
+                output_path = output_name + writer.extension
+                writer.submit(frame, detections, names, output_name)
+                saved_count += 1
+
+                report.add(index, milliseconds, output_path, detections, names)
+        pending.clear()
+        report.flush_if_due()
+        emit("detections", report.boxes)
+
+    decoder.start()
+    try:
+        while saved_count < max_saved:
+            with timer.time("wait_for_frames"):  # Time the model sat idle waiting on the decoder
+                item = frames.get()
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, Rewind) or (item is None and held is not None):
+                # Held frames were sampled too sparsely and are decoded again, unless the decoder
+                # couldn't seek back (or ended first), in which case they are all there is
+                if item is None or not item.seeked:
+                    pending.extend(held)
+                held = None
+            elif item is not None:
+                index, milliseconds, frame = item
+                entry = (index, milliseconds, frame, gate is None or gate.check(index, frame))
+                (pending if held is None else held).append(entry)
+            if not control.checkpoint():
+                break
+            # A batch is full once it holds batch_size frames to infer; gated frames only ride along
+            # (and are capped so a long still stretch doesn't pile up in memory)
+            if pending and (item is None or sum(infer for *_, infer in pending) >= batch_size
+                            or len(pending) >= batch_size * PREFETCH_BATCHES):
+                flush_batch()
+                while item is None and held is not None:
+                    # The decoder has ended, so no Rewind marker will answer a hit in the last batch
+                    pending.extend(held)
+                    held = None
+                    if pending:
+                        flush_batch()
+            if item is None:
+                break
+        if tracker is not None:
+            close_tracks(tracker.finish(), model.names)
+    finally:
+        stop.set()
+        decoder.join()
+        cap.release()
+        if events is not None:
+            events.close()
+        report.close()
+        writer.close()
+
+    performance = write_performance(timestamped_dir, "video", timer, time.perf_counter() - started, processed,
+                                    writer.stats)
+    return {"mode": "video", "saved": saved_count, "output_dir": timestamped_dir, "output_path": None,
+            "cancelled": control.cancelled, "writer": writer.stats, "gated": gate.gated if gate else None,
+            "performance": performance}
+
+
+class LatestFrameReader(threading.Thread):
+    # Reader for live sources that keeps only the newest frame, so when the model is slower than the
+    # camera it skips ahead instead of working through a backlog. A frame replaced before the model
+    # took it counts as dropped. A local file is read at its own frame rate to stand in for a camera.
+    # Once started, the reader owns the capture and releases it when it stops: a network read can
+    # block for far longer than anyone should wait, and a capture must not be released mid-read.
+
+    def __init__(self, cap, paced_fps=None):
+        super().__init__(name="stream-reader", daemon=True)
+        self._cap = cap
+        self._frame_time = 1 / paced_fps if paced_fps else 0
+        self._condition = threading.Condition()
+        self._latest = None  # (sequence number, time read, frame)
+        self._taken = -1
+        self._stop = threading.Event()
+        self.read = 0
+        self.dropped = 0
+        self.ended = False
+        self.error = None
+
+    def run(self):
+        next_read = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                ret, frame = self._cap.read()
+                if not ret:
+                    break
+                now = time.monotonic()
+                with self._condition:
+                    if self._latest is not None and self._latest[0] > self._taken:
+                        self.dropped += 1
+                    self._latest = (self.read, now, frame)
+                    self.read += 1
+                    self._condition.notify()
+                if self._frame_time:
+                    next_read += self._frame_time
+                    self._stop.wait(max(0.0, next_read - time.monotonic()))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._cap.release()
+            with self._condition:
+                self.ended = True
+                self._condition.notify()
+
+    def latest(self, timeout=None):
+        # Waits for a frame newer than the last one taken and returns it; None on timeout or at the end
+        with self._condition:
+            self._condition.wait_for(lambda: self.ended or (self._latest is not None
+                                                            and self._latest[0] > self._taken), timeout)
+            if self._latest is None or self._latest[0] <= self._taken:
+                return None
+            self._taken = self._latest[0]
+            return self._latest
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_stream(model, settings, emit, control):
+    source = str(settings["media_path"])
+    paced = os.path.isfile(source)
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise DetectionError(f"Could not open stream '{source}'.")
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Ask the capture backend not to queue frames of its own
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    timestamped_dir = os.path.join(settings["output_dir"], datetime.now().strftime("output_%Y%m%d_%H%M%S"))
+    os.makedirs(timestamped_dir, exist_ok=True)
+    emit("start", {"total": 0, "output_dir": timestamped_dir})  # A live source has no known length
+
+    writer = None
+    try:
+        thresholds, predict_args = prepare_filter(model, settings)
+        roi = load_roi(settings)
+        max_saved = settings["max_saved_frames"] or math.inf
+        duration = settings["stream_seconds"] or math.inf
+        saved_count, latencies = 0, []
+        timer = StageTimer()
+        writer = FrameWriter(emit, settings, timer=timer)
+        report = ReportWriter(timestamped_dir, parquet=settings["parquet"])
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        cap.release()
+        raise
+    reader = LatestFrameReader(cap, fps if paced and fps > 0 else None)
+
+    started = time.monotonic()
+    reader.start()
+    try:
+        with open(os.path.join(timestamped_dir, LATENCY_NAME), mode="w", newline="") as file:
+            latency_log = csv.writer(file)
+            latency_log.writerow(LATENCY_FIELDS)
+            while saved_count < max_saved and time.monotonic() - started < duration and control.checkpoint():
+                item = reader.latest(timeout=STREAM_POLL_INTERVAL)
+                if item is None:
+                    if reader.ended:
+                        break
+                    continue
+                index, read_at, frame = item
+                milliseconds = (read_at - started) * 1000
+
+                [detections] = detect(model, [frame], thresholds, predict_args, settings, roi, timer)
+                if len(detections.conf):
+                    output_name = os.path.join(timestamped_dir, f"stream_{index:07}")
+                    output_path = output_name + writer.extension
+                    writer.submit(frame, detections, model.names, output_name)
+                    saved_count += 1
+                    report.add(index, milliseconds, output_path, detections, model.names)
+
+                # End-to-end: from the frame being read to its detections being handed to the writer
+                latency = (time.monotonic() - read_at) * 1000
+                latencies.append(latency)
+                latency_log.writerow([index, format_timestamp(milliseconds), f"{latency:.1f}",
+                                      len(detections.conf), reader.dropped])
+                report.flush_if_due()
+                emit("progress", len(latencies))
+                emit("detections", report.boxes)
+    finally:
+        reader.stop()
+        reader.join(timeout=2.0)  # If it is still stuck in a read, it releases the capture itself later
+        report.close()
+        writer.close()
+    if reader.error is not None:
+        raise DetectionError(f"Stream read failed: {reader.error}")
+
+    latency_ms = None
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        latency_ms = {"mean": round(float(np.mean(latencies)), 1), "p50": round(float(p50), 1),
+                      "p95": round(float(p95), 1), "max": round(max(latencies), 1)}
+    performance = write_performance(timestamped_dir, "stream", timer, time.monotonic() - started, len(latencies),
+                                    writer.stats)
+    return {"mode": "stream", "saved": saved_count, "output_dir": timestamped_dir, "output_path": None,
+            "cancelled": control.cancelled, "writer": writer.stats, "processed": len(latencies),
+            "read": reader.read, "dropped": reader.dropped, "latency_ms": latency_ms, "performance": performance}
+
+
+def run_image(model, settings, emit, control):
+    output_dir = settings["output_dir"]
+    timer, started = StageTimer(), time.perf_counter()
+    try:
+        with timer.time("decode"):
+            img = cv2.imread(settings["media_path"])
+        thresholds, predict_args = prepare_filter(model, settings)
+        roi = load_roi(settings)
+        [detections] = detect(model, [img], thresholds, predict_args, settings, roi, timer)
+
+        output_path = None
+        writer = FrameWriter(emit, settings, workers=1, max_pending=1, timer=timer)
+        try:
+            if len(detections.conf):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                output_name = os.path.join(output_dir, f"annotated_{timestamp}")
+                output_path = output_name + writer.extension
+                writer.submit(img, detections, model.names, output_name)
+                with ReportWriter(output_dir, parquet=settings["parquet"]) as report:
+                    report.add("N/A", None, output_path, detections, model.names)
+        finally:
+            writer.close()
+    except Exception as e:
+        raise DetectionError(f"Could not process image: {e}")
+
+    performance = write_performance(output_dir, "image", timer, time.perf_counter() - started, 1, writer.stats)
+    return {"mode": "image", "saved": 1 if output_path else 0, "output_dir": output_dir,
+            "output_path": output_path, "cancelled": control.cancelled, "writer": writer.stats,
+            "performance": performance}
+
+
+def run_images(model, settings, emit, control):
+    output_dir = settings["output_dir"]
+    paths = collect_images(settings["media_path"])
+    names = {path: f"annotated_{stem}" for path, stem in _unique_stems(paths).items()}
+    batch_size = max(1, settings["batch_size"])
+    thresholds, predict_args = prepare_filter(model, settings)
+    roi = load_roi(settings)
+
+    # Inputs finished by an earlier run into the same output directory are skipped
+    manifest_path = os.path.join(output_dir, PROCESSED_MANIFEST)
+    done = set()
+    if settings["skip_processed"] and os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            done = {line.rstrip("\n") for line in file}
+    todo = [path for path in paths if os.path.abspath(path) not in done]
+    skipped = len(paths) - len(todo)
+
+    emit("start", {"total": len(paths), "output_dir": output_dir})
+    emit("progress", skipped)
+
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    saved_count, failed_count, processed = 0, 0, skipped
+    timer, started = StageTimer(), time.perf_counter()
+    writer = FrameWriter(emit, settings, timer=timer)
+    report = ReportWriter(output_dir, parquet=settings["parquet"])
+    decoders = ThreadPoolExecutor(max_workers=DECODE_THREADS, thread_name_prefix="image-decoder")
+
+    def read(path):
+        with timer.time("decode"):
+            return cv2.imread(path)
+
+    try:
+        # The next batch is decoded while the model works on the current one
+        next_images = [decoders.submit(read, path) for path in batches[0]] if batches else []
+        for number, batch in enumerate(batches):
+            if not control.checkpoint():
+                break
+            with timer.time("wait_for_frames"):
+                images = [future.result() for future in next_images]
+            if number + 1 < len(batches):
+                next_images = [decoders.submit(read, path) for path in batches[number + 1]]
+
+            readable = [(path, img) for path, img in zip(batch, images) if img is not None]
+            failed_count += len(batch) - len(readable)
+            results = detect(model, [img for _, img in readable], thresholds, predict_args, settings, roi, timer)
+
+            for (path, img), detections in zip(readable, results):
+                if len(detections.conf):
+                    output_name = os.path.join(output_dir, names[path])
+                    output_path = output_name + writer.extension
+                    writer.submit(img, detections, model.names, output_name)
+                    saved_count += 1
+                    report.add("N/A", None, output_path, detections, model.names)
+
+            # The report is flushed before the manifest marks the batch as done, so a rerun resumes here
+            report.flush()
+            with open(manifest_path, "a") as file:
+                file.writelines(os.path.abspath(path) + "\n" for path, _ in readable)
+
+            processed += len(batch)
+            emit("progress", processed)
+            emit("detections", report.boxes)
+    finally:
+        decoders.shutdown(wait=True, cancel_futures=True)
+        report.close()
+        writer.close()
+
+    performance = write_performance(output_dir, "images", timer, time.perf_counter() - started,
+                                    processed - skipped, writer.stats)
+    return {"mode": "images", "saved": saved_count, "output_dir": output_dir, "output_path": None,
+            "cancelled": control.cancelled, "skipped": skipped, "failed": failed_count, "writer": writer.stats,
+            "performance": performance}
+
+
+# Set in each job process by _init_job_process
+_job_messages = None
+_job_control = None
+
+
+def _init_job_process(torch_threads, messages, control):
+    global _job_messages, _job_control
+    import torch
+
+    # Split the cores between the workers instead of letting every process use all of them
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(torch_threads)
+    _job_messages = messages
+    _job_control = control
+
+
+def _run_job(job_id, settings):
+    last_sent, unsent = {}, {}
+
+    def emit(kind, payload=None):
+        if kind == "preview":
+            return  # Frames aren't worth pickling across processes
+        if kind in ("progress", "detections"):
+            # Both are running totals, so only the latest value matters; one held back here is
+            # sent once the job ends
+            now = time.monotonic()
+            if now - last_sent.get(kind, 0.0) < JOB_PROGRESS_INTERVAL:
+                unsent[kind] = payload
+                return
+            last_sent[kind] = now
+            unsent.pop(kind, None)
+        _job_messages.put((job_id, kind, payload))
+
+    # Follow the shared pause/cancel flags with a local control, so the per-frame
+    # checkpoints don't each cost a round trip to the manager process
+    control = RunControl()
+    finished = threading.Event()
+
+    def follow():
+        while not finished.wait(JOB_POLL_INTERVAL):
+            _sync_control(_job_control, control)
+
+    threading.Thread(target=follow, name="job-control", daemon=True).start()
+    try:
+        return run_detection(settings, emit, control)
+    finally:
+        finished.set()
+        for kind, payload in unsent.items():
+            _job_messages.put((job_id, kind, payload))
+
+
+def run_jobs(settings, emit, control):
+    output_dir = settings["output_dir"]
+    videos = collect_videos(settings["media_path"])
+    if not videos:
+        raise DetectionError("No videos to process.")
+    workers = max(1, min(settings["job_workers"], len(videos)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    stems = _unique_stems(videos)
+
+    emit("start", {"total": len(videos), "output_dir": output_dir, "jobs": videos})
+    emit("progress", 0)
+
+    rows = [{"Video": video, "Status": "queued", "Frames Saved": 0, "Output Directory": "", "Error": ""}
+            for video in videos]
+    # spawn, not fork: the parent may already hold torch/OpenMP threads and a Tk window
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        messages = manager.Queue()
+        shared_control = RunControl(manager.Event(), manager.Event())
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_job_process,
+                                 initargs=(torch_threads, messages, shared_control)) as pool:
+            futures = {}
+            for job_id, video in enumerate(videos):
+                # Each video gets its own folder, inside which run_video makes the timestamped output dir
+                job_settings = dict(settings, mode="video", media_path=video, resume_dir=None,
+                                    output_dir=os.path.join(output_dir, stems[video]))
+                os.makedirs(job_settings["output_dir"], exist_ok=True)
+                futures[pool.submit(_run_job, job_id, job_settings)] = job_id
+
+            pending, finished_count = set(futures), 0
+            detections = [0] * len(videos)
+            while pending:
+                _sync_control(control, shared_control)
+                if control.cancelled:
+                    for future in pending:
+                        future.cancel()  # Jobs that haven't started yet are dropped
+
+                done, pending = wait(pending, timeout=JOB_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                while True:
+                    try:
+                        job_id, kind, payload = messages.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == "start":
+                        rows[job_id]["Status"] = "running"
+                        rows[job_id]["Output Directory"] = payload["output_dir"]
+                    elif kind == "detections":
+                        detections[job_id] = payload
+                        emit("detections", sum(detections))
+                        continue
+                    emit("job", {"job": job_id, "kind": kind, "payload": payload})
+
+                for future in done:
+                    job_id = futures[future]
+                    row = rows[job_id]
+                    if future.cancelled():
+                        row["Status"] = "cancelled"
+                    elif future.exception() is not None:
+                        row["Status"] = "failed"
+                        row["Error"] = str(future.exception())
+                    else:
+                        summary = future.result()
+                        row["Status"] = "cancelled" if summary["cancelled"] else "done"
+                        row["Frames Saved"] = summary["saved"]
+                        row["Output Directory"] = summary["output_dir"]
+                    emit("job", {"job": job_id, "kind": row["Status"], "payload": dict(row)})
+                    finished_count += 1
+                    emit("progress", finished_count)
+
+    # One aggregated report covering every job of the run
+    with open(os.path.join(output_dir, JOBS_REPORT), mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=JOB_REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return {"mode": "jobs", "saved": sum(row["Frames Saved"] for row in rows), "output_dir": output_dir,
+            "output_path": None, "cancelled": control.cancelled, "jobs": rows}
+
+
+def run_detection(settings, emit, control):
+    # Runs one detection job to completion, reporting through emit(kind, payload):
+    #   "start"    {"total", "output_dir"}   (video, "stream", "images" and "jobs" modes; total 0 for streams)
+    #   "progress" number of frames read / images processed / jobs finished so far
+    #   "detections" number of boxes kept so far
+    #   "preview"  latest annotated frame (BGR)
+    #   "job"      {"job", "kind", "payload"}: a message from one job of a "jobs" run
+    # and returns a summary dict once finished or cancelled.
+    weight_file = model_weights(settings)
+    if settings["mode"] == "jobs":
+        # Exported once here; every job process then loads its own copy of the model
+        return run_jobs(dict(settings, weight_file=weight_file), emit, control)
+
+    try:
+        model = load_model(weight_file)
+    except Exception as e:
+        raise DetectionError(f"Could not load YOLO model: {e}")
+
+    if settings["mode"] == "video":
+        return run_video(model, settings, emit, control)
+    if settings["mode"] == "stream":
+        return run_stream(model, settings, emit, control)
+    if settings["mode"] == "images":
+        return run_images(model, settings, emit, control)
+    return run_image(model, settings, emit, control)
+
+
+def sample_frames(settings, count):
+    # Up to count frames spread evenly over a video, or the first count images, for comparisons
+    if settings["mode"] == "video":
+        cap = cv2.VideoCapture(settings["media_path"])
+        if not cap.isOpened():
+            raise DetectionError("Could not open video.")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for index in np.linspace(0, max(0, total - 1), num=min(count, max(total, 1)), dtype=np.int64):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+        return frames
+    images = (cv2.imread(path) for path in collect_images(settings["media_path"])[:count])
+    return [img for img in images if img is not None]
+
+
+def _matched_boxes(reference, detections):
+    # Number of boxes that pair up one-to-one with a box of the same class (IoU >= COMPARE_IOU)
+    if not len(reference.conf) or not len(detections.conf):
+        return 0
+    iou = box_iou(reference.xyxy, detections.xyxy)
+    iou[reference.cls[:, None] != detections.cls[None, :]] = 0
+    matched = 0
+    while iou.max() >= COMPARE_IOU:
+        r, d = np.unravel_index(np.argmax(iou), iou.shape)
+        iou[r, :] = 0
+        iou[:, d] = 0
+        matched += 1
+    return matched
+
+
+def compare_backends(settings, variants, count=50):
+    # Runs the same sample frames through PyTorch and each (backend, precision) variant, one frame per
+    # predict() call after a warm-up, and returns one row per variant: mean latency and how many of
+    # the PyTorch detections it reproduces
+    frames = sample_frames(settings, count)
+    if not frames:
+        raise DetectionError("No frames to compare on.")
+    rows, reference = [], None
+    for backend, precision in [("pytorch", "fp32")] + [v for v in variants if v != ("pytorch", "fp32")]:
+        weight_file = export_model(settings["weight_file"], backend, precision)
+        try:
+            model = load_model(weight_file, warm=True)
+        except Exception as e:
+            raise DetectionError(f"Could not load {weight_file}: {e}")
+        thresholds, predict_args = prepare_filter(model, settings)
+        predict_args["verbose"] = False
+        roi = load_roi(settings)
+
+        results, elapsed = [], 0.0
+        for frame in frames:
+            started = time.perf_counter()
+            results.extend(detect(model, [frame], thresholds, predict_args, settings, roi))
+            elapsed += time.perf_counter() - started
+        if reference is None:
+            reference = results
+
+        boxes = sum(len(detections.conf) for detections in results)
+        expected = sum(len(detections.conf) for detections in reference)
+        matched = sum(_matched_boxes(a, b) for a, b in zip(reference, results))
+        rows.append({"backend": backend, "precision": precision, "model": weight_file, "frames": len(frames),
+                     "ms_per_frame": round(1000 * elapsed / len(frames), 2), "detections": boxes,
+                     "matched": matched, "recall_vs_pytorch": round(matched / expected, 4) if expected else None,
+                     "precision_vs_pytorch": round(matched / boxes, 4) if boxes else None})
+    return rows
+
+
+class PreviewChannel:
+    # Latest-frame mailbox between the pipeline and a display. offer() is called for every annotated
+    # frame but only does work when a preview is due: at most max_fps frames are taken, and none while
+    # the display is hidden or hasn't shown the previous one yet. A taken frame is shrunk with
+    # INTER_AREA and converted to RGB into buffers reused from frame to frame; the display reads it
+    # with take() and hands it back with release().
+
+    def __init__(self, max_fps=PREVIEW_FPS, max_size=PREVIEW_SIZE):
+        self.visible = True  # Set to False while the window is minimised
+        self._interval = 1 / max_fps
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._due = 0.0
+        self._ready = False  # The display hasn't released the buffer yet, so offer() leaves it alone
+        self._resized = None
+        self._rgb = None
+
+    def offer(self, frame):
+        # Cheap checks first, without the lock; called from writer threads
+        if not self.visible or self._ready or time.monotonic() < self._due:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._ready or now < self._due:
+                return  # Another writer thread got there first
+            self._due = now + self._interval
+
+            height, width = frame.shape[:2]
+            scale = min(1.0, self._max_size[0] / width, self._max_size[1] / height)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            if self._rgb is None or self._rgb.shape[:2] != (size[1], size[0]):
+                self._resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                self._rgb = np.empty_like(self._resized)
+            if scale < 1.0:
+                cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+                frame = self._resized
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            self._ready = True
+
+    def take(self):
+        # The waiting preview (RGB, height x width x 3) or None; valid until release()
+        return self._rgb if self._ready else None
+
+    def release(self):
+        self._ready = False
+
+
+class DetectionWorker(threading.Thread):
+    # Runs run_detection off the Tk main thread. Messages and the final result are
+    # posted to `messages` as (kind, payload) tuples; the GUI drains the queue with
+    # app.after() so the window never blocks on the model. Per-frame updates bypass
+    # the queue: counts land in `progress`, which the GUI reads on its own clock, and
+    # previews go through the `preview` channel, which only keeps the latest frame.
+
+    def __init__(self, settings, preview=None):
+        super().__init__(daemon=True)
+        self.settings = settings
+        self.messages = queue.Queue()
+        self.control = RunControl()
+        self.preview = preview or PreviewChannel()
+        self.progress = ProgressMeter(PROGRESS_UNITS.get(settings["mode"], "frames"))
+
+    def emit(self, kind, payload=None):
+        if kind == "preview":
+            self.preview.offer(payload)
+            return
+        if kind == "progress":
+            self.progress.update(payload)
+            return
+        if kind == "detections":
+            self.progress.detections = payload
+            return
+        if kind == "start":
+            self.progress.start(payload["total"])
+        self.messages.put((kind, payload))
+
+    def run(self):
+        try:
+            summary = run_detection(self.settings, self.emit, self.control)
+        except DetectionError as e:
+            self.emit("error", str(e))
+        except Exception as e:
+            self.emit("error", f"Detection failed: {e}")
+        else:
+            self.emit("done", summary)
+
+
+def _console_emitter(quiet, unit):
+    # emit() for the command-line runner: a progress line on stderr every CONSOLE_PROGRESS_INTERVAL
+    progress, last = ProgressMeter(unit), [0.0]
+
+    def emit(kind, payload=None):
+        if quiet:
+            return
+        if kind == "start":
+            progress.start(payload["total"])
+            print(f"Writing results to {payload['output_dir']}", file=sys.stderr)
+        elif kind == "detections":
+            progress.detections = payload
+        elif kind == "progress":
+            progress.update(payload)
+            now = time.monotonic()
+            if now - last[0] >= CONSOLE_PROGRESS_INTERVAL or 0 < progress.total <= payload:
+                last[0] = now
+                print(format_progress(progress.snapshot()), file=sys.stderr)
+        elif kind == "job" and payload["kind"] in ("done", "failed", "cancelled"):
+            print(f"Job {payload['job'] + 1} {payload['kind']}: {payload['payload']['Video']}", file=sys.stderr)
+
+    return emit
+
+
+def _class_threshold_arg(text):
+    try:
+        [(name, threshold)] = parse_class_thresholds(text).items()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CLASS=CONF, got '{text}'")
+    return name, threshold
+
+
+def _roi_arg(text):
+    try:
+        [region] = parse_regions(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return region
+
+
+def settings_from_args(args):
+    if args.video:
+        mode, media_path = "video", args.video
+    elif args.stream:
+        mode, media_path = "stream", args.stream
+    elif args.videos:
+        mode, media_path = "jobs", args.videos
+    elif args.images:
+        mode, media_path = "images", args.images
+    else:
+        mode, media_path = "image", args.image
+    return make_settings(mode=mode, media_path=media_path, output_dir=args.out,
+                         weight_file=args.weights, frame_interval=args.interval, sample_seconds=args.every_seconds,
+                         confidence_threshold=args.conf, class_thresholds=dict(args.class_conf), classes=args.classes,
+                         backend=args.backend, precision=args.precision,
+                         batch_size=args.batch_size, tile_size=args.tile, tile_overlap=args.tile_overlap,
+                         tile_full_frame=not args.tiles_only, roi=args.roi,
+                         image_format=args.format, image_quality=args.quality, output_scale=args.scale,
+                         save_raw=args.raw, video_output=args.save_as, clip_padding=args.clip_padding,
+                         track=args.track, track_iou=args.track_iou, track_max_gap=args.track_gap,
+                         adaptive_sampling=args.adaptive, adaptive_window_seconds=args.adaptive_window,
+                         adaptive_max_fps=args.adaptive_max_fps, motion_gate=args.motion_gate,
+                         motion_threshold=args.motion_threshold, motion_force_seconds=args.motion_force,
+                         stream_seconds=args.duration, max_saved_frames=args.max_saved, parquet=args.parquet,
+                         resume_dir=args.resume, skip_processed=not args.reprocess, job_workers=args.workers)
+
+
+def command_run(args):
+    settings = settings_from_args(args)
+    os.makedirs(settings["output_dir"], exist_ok=True)
+
+    # Ctrl+C cancels cleanly (the partial report is still written); a second Ctrl+C aborts
+    control = RunControl()
+
+    def interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        control.cancel()
+
+    previous_handler = signal.signal(signal.SIGINT, interrupt)
+    try:
+        summary = run_detection(settings, _console_emitter(args.quiet, PROGRESS_UNITS[settings["mode"]]), control)
+    except DetectionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    if summary["mode"] == "video":
+        print(f"{summary['saved']} frames saved in: {summary['output_dir']}")
+    elif summary["mode"] == "stream":
+        print(f"{summary['saved']} frames saved in: {summary['output_dir']}")
+        print(f"{summary['processed']} of {summary['read']} frames processed, {summary['dropped']} dropped")
+        if summary["latency_ms"]:
+            latency = summary["latency_ms"]
+            print(f"Latency: mean {latency['mean']} ms, p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                  f"max {latency['max']} ms (per frame in {LATENCY_NAME})")
+    elif summary["mode"] == "jobs":
+        for row in summary["jobs"]:
+            print(f"{row['Status']:>9}  {row['Frames Saved']:>5} frames  {row['Video']}  {row['Error']}".rstrip())
+        print(f"{summary['saved']} frames saved in: {summary['output_dir']} (see {JOBS_REPORT})")
+    elif summary["mode"] == "images":
+        print(f"{summary['saved']} annotated images saved in: {summary['output_dir']} "
+              f"({summary['skipped']} already processed, {summary['failed']} unreadable)")
+    elif summary["output_path"]:
+        print(f"Annotated image saved as {summary['output_path']}")
+    else:
+        print("No objects were detected in the image with the specified confidence.")
+    if summary.get("gated") is not None:
+        print(f"{summary['gated']} sampled frames skipped by the motion gate")
+    if summary.get("performance"):
+        print(format_performance(summary["performance"]))
+    if summary.get("writer"):
+        stats = summary["writer"]
+        print(f"Wrote {stats['files']} files, {stats['bytes'] / 1e6:.1f} MB "
+              f"(encoding {stats['encode_seconds']:.1f}s, writing {stats['write_seconds']:.1f}s)")
+    return 130 if summary["cancelled"] else 0
+
+
+def _variant_arg(text):
+    backend, _, precision = text.partition("/")
+    if (precision or "fp32") not in BACKEND_PRECISIONS.get(backend, ()):
+        raise argparse.ArgumentTypeError(f"unknown backend '{text}'; use e.g. onnx, onnx/int8, openvino/fp16")
+    return backend, precision or "fp32"
+
+
+def command_compare(args):
+    settings = make_settings(mode="video" if args.video else "images", media_path=args.video or args.images,
+                             weight_file=args.weights, confidence_threshold=args.conf,
+                             tile_size=args.tile, roi=args.roi)
+    try:
+        rows = compare_backends(settings, args.backends, args.frames)
+    except DetectionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'backend':<10} {'precision':<9} {'ms/frame':>9} {'boxes':>6} {'recall':>7} {'precision':>9}  model")
+    for row in rows:
+        recall, precision = (f"{row[key]:.3f}" if row[key] is not None else "-"
+                             for key in ("recall_vs_pytorch", "precision_vs_pytorch"))
+        print(f"{row['backend']:<10} {row['precision']:<9} {row['ms_per_frame']:>9.1f} {row['detections']:>6} "
+              f"{recall:>7} {precision:>9}  {row['model']}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m detector", description="Headless drone and bird detection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run detection on a video, an image or a set of images")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="video file to process")
+    source.add_argument("--videos", nargs="+", metavar="SOURCE",
+                        help="several videos (directories, glob patterns, .txt file lists or files) run as a job queue")
+    source.add_argument("--stream", metavar="SOURCE",
+                        help="live source: RTSP/HTTP URL, camera number (e.g. 0), or a video file played in real time")
+    source.add_argument("--image", help="image file to process")
+    source.add_argument("--images", nargs="+", metavar="SOURCE",
+                        help="image directories, glob patterns (quote them), .txt file lists or image files")
+    run.add_argument("--out", required=True, help="output directory (created if missing)")
+    run.add_argument("--format", choices=sorted(IMAGE_FORMATS), default=DEFAULT_SETTINGS["image_format"],
+                     help="saved image format (default: %(default)s)")
+    run.add_argument("--quality", type=int, default=DEFAULT_SETTINGS["image_quality"],
+                     help="JPEG/WebP quality 1-100 (default: %(default)s)")
+    run.add_argument("--scale", type=float, default=DEFAULT_SETTINGS["output_scale"],
+                     help="scale factor for saved images, e.g. 0.5 (default: %(default)s)")
+    run.add_argument("--raw", action="store_true",
+                     help="save unannotated frames plus a .json sidecar with the boxes")
+    run.add_argument("--save-as", choices=VIDEO_OUTPUTS, default=DEFAULT_SETTINGS["video_output"],
+                     help="video mode: one image per frame, one detections.mp4, or event clips (default: %(default)s)")
+    run.add_argument("--clip-padding", type=float, default=DEFAULT_SETTINGS["clip_padding"],
+                     help="seconds kept before/after each event with --save-as clips (default: %(default)s)")
+    run.add_argument("--track", action="store_true",
+                     help="video mode: collapse repeated detections into tracks, write events.csv and save only "
+                          "the best frame of each track")
+    run.add_argument("--track-iou", type=float, default=DEFAULT_SETTINGS["track_iou"],
+                     help="minimum IoU to continue a track (default: %(default)s)")
+    run.add_argument("--track-gap", type=float, default=DEFAULT_SETTINGS["track_max_gap"],
+                     help="seconds a track may go undetected before its event closes (default: %(default)s)")
+    run.add_argument("--motion-gate", action="store_true",
+                     help="video mode: only run the model on sampled frames where the scene changed")
+    run.add_argument("--motion-threshold", type=float, default=DEFAULT_SETTINGS["motion_threshold"],
+                     help="fraction of pixels that must change to count as motion (default: %(default)s)")
+    run.add_argument("--motion-force", type=float, default=DEFAULT_SETTINGS["motion_force_seconds"],
+                     help="with --motion-gate, still run the model every N seconds of video (default: %(default)s)")
+    run.add_argument("--duration", type=float, default=DEFAULT_SETTINGS["stream_seconds"],
+                     help="with --stream, stop after this many seconds (default: until Ctrl+C)")
+    run.add_argument("--max-saved", type=int, default=DEFAULT_SETTINGS["max_saved_frames"],
+                     help="stop a video after this many frames with detections (default: no limit)")
+    run.add_argument("--parquet", action="store_true",
+                     help="also write one row per box to detections.parquet (needs pyarrow)")
+    run.add_argument("--resume", metavar="OUTPUT_DIR",
+                     help="with --video, continue an interrupted run in its output_<timestamp> folder")
+    run.add_argument("--weights", required=True, help="YOLO weight file")
+    run.add_argument("--interval", type=int, default=DEFAULT_SETTINGS["frame_interval"],
+                     help="process every Nth video frame (default: %(default)s)")
+    run.add_argument("--every-seconds", type=float, default=DEFAULT_SETTINGS["sample_seconds"],
+                     help="process one video frame every N seconds instead of using --interval")
+    run.add_argument("--adaptive", action="store_true",
+                     help="sample sparsely (--interval/--every-seconds) until something is detected, then every "
+                          "frame for a while")
+    run.add_argument("--adaptive-window", type=float, default=DEFAULT_SETTINGS["adaptive_window_seconds"],
+                     help="seconds of dense sampling after a detection before decaying (default: %(default)s)")
+    run.add_argument("--adaptive-max-fps", type=float, default=DEFAULT_SETTINGS["adaptive_max_fps"],
+                     help="cap dense sampling at N frames per second of video (default: every frame)")
+    run.add_argument("--conf", type=float, default=DEFAULT_SETTINGS["confidence_threshold"],
+                     help="confidence threshold (default: %(default)s)")
+    run.add_argument("--class-conf", nargs="+", default=[], metavar="CLASS=CONF", type=_class_threshold_arg,
+                     help="per-class thresholds overriding --conf, e.g. drone=0.35 bird=0.6")
+    run.add_argument("--classes", nargs="+", metavar="CLASS", help="only detect these classes (names or ids)")
+    run.add_argument("--backend", choices=sorted(BACKEND_PRECISIONS), default=DEFAULT_SETTINGS["backend"],
+                     help="run .pt weights as exported ONNX Runtime / OpenVINO models, cached next to them "
+                          "(default: %(default)s)")
+    run.add_argument("--precision", choices=("fp32", "fp16", "int8"), default=DEFAULT_SETTINGS["precision"],
+                     help="exported model precision: fp16 for OpenVINO, int8 for both (default: %(default)s)")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_SETTINGS["batch_size"],
+                     help="video frames / images per model.predict call (default: %(default)s)")
+    run.add_argument("--tile", type=int, default=DEFAULT_SETTINGS["tile_size"], metavar="SIZE",
+                     help="run the model on overlapping SIZE x SIZE tiles to find small objects, e.g. 640")
+    run.add_argument("--tile-overlap", type=float, default=DEFAULT_SETTINGS["tile_overlap"],
+                     help="fraction of each tile shared with its neighbours (default: %(default)s)")
+    run.add_argument("--tiles-only", action="store_true",
+                     help="with --tile, skip the extra whole-frame pass that catches large objects")
+    run.add_argument("--roi", nargs="+", type=_roi_arg, metavar="REGION",
+                     help="regions of interest in frame pixels, each a rectangle X1,Y1,X2,Y2 or a polygon "
+                          "X1,Y1,X2,Y2,X3,Y3,...; frames are cropped to them and boxes outside are dropped "
+                          f"(default: <video or image>{ROI_SUFFIX} next to the input, if present)")
+    run.add_argument("--reprocess", action="store_true",
+                     help="with --images, don't skip inputs already listed in processed_images.txt")
+    run.add_argument("--workers", type=int, default=DEFAULT_SETTINGS["job_workers"],
+                     help="with --videos, number of worker processes (default: %(default)s)")
+    run.add_argument("--quiet", action="store_true", help="don't print progress")
+    run.set_defaults(func=command_run)
+
+    compare = commands.add_parser("compare", help="compare speed and detections of exported backends with PyTorch")
+    source = compare.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="video to sample frames from")
+    source.add_argument("--images", nargs="+", metavar="SOURCE", help="image directories, glob patterns or files")
+    compare.add_argument("--weights", required=True, help="YOLO .pt weight file")
+    compare.add_argument("--backends", nargs="+", type=_variant_arg, metavar="BACKEND[/PRECISION]",
+                         default=[("onnx", "fp32"), ("openvino", "fp32")],
+                         help="variants to compare, e.g. onnx onnx/int8 openvino/fp16 (default: onnx openvino)")
+    compare.add_argument("--frames", type=int, default=50, help="frames or images to run (default: %(default)s)")
+    compare.add_argument("--conf", type=float, default=DEFAULT_SETTINGS["confidence_threshold"],
+                         help="confidence threshold (default: %(default)s)")
+    compare.add_argument("--tile", type=int, default=0, metavar="SIZE", help="compare with tiled inference")
+    compare.add_argument("--roi", nargs="+", type=_roi_arg, metavar="REGION", help="regions of interest, as for run")
+    compare.add_argument("--json", action="store_true", help="print the results as JSON")
+    compare.set_defaults(func=command_compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+
+# Frames are compared at this width; small enough to cost well under a millisecond per frame
+MOTION_WIDTH = 160
+# A pixel counts as changed when it differs from the background by more than this (0-255)
+MOTION_PIXEL_DELTA = 25
+# How quickly the background follows the scene (0-1); slow drift such as clouds gets absorbed
+MOTION_BACKGROUND_RATE = 0.05
+
+
+class MotionGate:
+    # Cheap pre-filter in front of model.predict: a downscaled, blurred greyscale frame is compared
+    # against a running-average background, and the frame only goes to the model when enough of it
+    # changed. Every force_every frames of video the model runs anyway, so stationary targets that
+    # have been absorbed into the background are still picked up.
+
+    def __init__(self, min_changed=0.002, force_every=150):
+        self.min_changed = min_changed  # Fraction of pixels that must change, e.g. 0.002 = 0.2%
+        self.force_every = force_every
+        self.gated = 0
+        self._background = None
+        self._last_inference = None
+
+    def _small(self, frame):
+        height, width = frame.shape[:2]
+        size = (MOTION_WIDTH, max(1, round(height * MOTION_WIDTH / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+
+    def check(self, index, frame):
+        # True when the frame should be sent to the model
+        small = self._small(frame)
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small
+            self._last_inference = index
+            return True
+
+        changed = np.count_nonzero(cv2.absdiff(small, self._background) > MOTION_PIXEL_DELTA) / small.size
+        cv2.accumulateWeighted(small, self._background, MOTION_BACKGROUND_RATE)
+        if changed >= self.min_changed or index - self._last_inference >= self.force_every:
+            self._last_inference = index
+            return True
+        self.gated += 1
+        return False
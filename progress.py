@@ -0,0 +1,67 @@
+import time
+from collections import deque
+
+# The rate (and so the ETA) is measured over roughly this many seconds of recent progress, so it
+# follows changes in speed instead of averaging over the whole run
+RATE_WINDOW_SECONDS = 5.0
+
+
+class ProgressMeter:
+    # Latest progress of a run: written by the detection thread on every frame, read by the UI on its
+    # own clock. Writes only store numbers; the rate and ETA are worked out in snapshot(), so the
+    # cost per frame stays the same however often (or rarely) the display refreshes.
+
+    def __init__(self, unit="frames"):
+        self.unit = unit
+        self.start(0)
+
+    def start(self, total):
+        self.total = total  # 0 when the end isn't known (live streams)
+        self.done = 0
+        self.detections = 0
+        self._started = time.monotonic()
+        self._samples = deque()  # (time, done); the first one is the run's starting point
+
+    def update(self, done):
+        # The first count may be a resume point or inputs skipped from an earlier run; it is the
+        # baseline for the rate rather than work done in this run
+        if not self._samples:
+            self._samples.append((time.monotonic(), done))
+        self.done = done
+
+    def snapshot(self):
+        # {"unit", "done", "total", "rate" (per second), "eta_seconds" (None when unknown),
+        #  "elapsed_seconds", "detections"}
+        now, done, samples = time.monotonic(), self.done, self._samples
+        rate = 0.0
+        if samples:
+            samples.append((now, done))
+            while len(samples) > 2 and now - samples[1][0] >= RATE_WINDOW_SECONDS:
+                samples.popleft()
+            then, done_then = samples[0]
+            if now > then:
+                rate = (done - done_then) / (now - then)
+        eta = (self.total - done) / rate if self.total and rate > 0 else None
+        return {"unit": self.unit, "done": done, "total": self.total, "rate": rate, "eta_seconds": eta,
+                "elapsed_seconds": now - self._started, "detections": self.detections}
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+def format_progress(progress):
+    # "1200/5400 frames, 41.3 frames/s, ETA 1:42, 17 detections" from a ProgressMeter snapshot
+    if not progress["done"] and not progress["total"]:
+        return ""
+    unit = progress["unit"]
+    parts = [f"{progress['done']}/{progress['total']} {unit}" if progress["total"]
+             else f"{progress['done']} {unit}", f"{progress['rate']:.1f} {unit}/s"]
+    if progress["eta_seconds"] is not None:
+        parts.append(f"ETA {format_duration(progress['eta_seconds'])}")
+    else:
+        parts.append(f"elapsed {format_duration(progress['elapsed_seconds'])}")
+    parts.append(f"{progress['detections']} detections")
+    return ", ".join(parts)
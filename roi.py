@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+def parse_regions(text):
+    # "0,0,1920,600; 100,700 900,650 1000,1080 0,1080" -> [(0, 0, 1920, 600), [(100, 700), (900, 650), ...]]
+    # Four numbers are a rectangle (x1, y1, x2, y2), three or more x,y points a polygon
+    regions = []
+    for item in text.split(";"):
+        values = item.replace(",", " ").split()
+        if not values:
+            continue
+        try:
+            numbers = [int(round(float(value))) for value in values]
+        except ValueError:
+            raise ValueError(f"Expected pixel coordinates in region '{item.strip()}'")
+        if len(numbers) == 4:
+            x1, y1, x2, y2 = numbers
+            regions.append((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+        elif len(numbers) >= 6 and len(numbers) % 2 == 0:
+            regions.append([tuple(numbers[i:i + 2]) for i in range(0, len(numbers), 2)])
+        else:
+            raise ValueError(f"Expected x1,y1,x2,y2 or at least three x,y points, got '{item.strip()}'")
+    return regions
+
+
+class RegionOfInterest:
+    # The union of a set of rectangles and polygons in frame pixels. Frames are cropped to its bounding
+    # box before inference, and boxes whose centre falls outside the regions are dropped.
+
+    def __init__(self, regions):
+        self.polygons = []
+        for region in regions:
+            if len(region) == 4 and np.ndim(region) == 1:
+                x1, y1, x2, y2 = region
+                region = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            self.polygons.append(np.array(region, dtype=np.int32).reshape(-1, 2))
+        self._masks = {}  # (width, height) -> mask, built once per frame size
+
+    def rectangles(self, width, height):
+        # Bounding box of each region, clipped to the frame; regions entirely outside it are left out
+        rectangles = []
+        for polygon in self.polygons:
+            x1, y1 = np.clip(polygon.min(axis=0), 0, (width, height))
+            x2, y2 = np.clip(polygon.max(axis=0) + 1, 0, (width, height))
+            if x2 > x1 and y2 > y1:
+                rectangles.append((int(x1), int(y1), int(x2), int(y2)))
+        return rectangles
+
+    def bounds(self, width, height):
+        # Bounding box of all regions (x1, y1, x2, y2), or None when none of them is inside the frame
+        rectangles = self.rectangles(width, height)
+        if not rectangles:
+            return None
+        x1, y1, _, _ = np.min(rectangles, axis=0)
+        _, _, x2, y2 = np.max(rectangles, axis=0)
+        return int(x1), int(y1), int(x2), int(y2)
+
+    def mask(self, width, height):
+        mask = self._masks.get((width, height))
+        if mask is None:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, self.polygons, 1)
+            self._masks[(width, height)] = mask
+        return mask
+
+    def contains(self, xyxy, width, height):
+        # Boolean mask over boxes: True where the box centre lies inside one of the regions
+        centres = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(np.int64)
+        x = np.clip(centres[:, 0], 0, width - 1)
+        y = np.clip(centres[:, 1], 0, height - 1)
+        return self.mask(width, height)[y, x].astype(bool)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def _starts(length, size, step):
+    # Tile offsets along one axis; the last tile is aligned with the far edge instead of overhanging it
+    if length <= size:
+        return [0]
+    return list(range(0, length - size, step)) + [length - size]
+
+
+def tile_windows(width, height, size, overlap=0.2, regions=None):
+    # Overlapping size x size windows (x1, y1, x2, y2) covering a width x height frame. With regions
+    # (a list of (x1, y1, x2, y2) rectangles) only windows that touch one of them are kept.
+    step = max(1, int(size * (1 - overlap)))
+    windows = [(x, y, min(x + size, width), min(y + size, height))
+               for y in _starts(height, size, step) for x in _starts(width, size, step)]
+    if regions:
+        windows = [(x1, y1, x2, y2) for x1, y1, x2, y2 in windows
+                   if any(x1 < rx2 and rx1 < x2 and y1 < ry2 and ry1 < y2 for rx1, ry1, rx2, ry2 in regions)]
+    return windows
+
+
+def box_ios(a, b):
+    # Intersection over the smaller box, for every box in a (N, 4) against every box in b (M, 4). A box
+    # cut off at a tile border is mostly inside the full box from the neighbouring tile, which IoU misses.
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return intersection / (np.minimum(area_a[:, None], area_b[None, :]) + 1e-9)
+
+
+def merge_boxes(xyxy, conf, cls, threshold=0.6):
+    # Greedy per-class NMS across tiles: indices of the boxes to keep, most confident first
+    overlap = box_ios(xyxy, xyxy) >= threshold
+    overlap &= cls[:, None] == cls[None, :]
+    suppressed = np.zeros(len(conf), dtype=bool)
+    keep = []
+    for i in np.argsort(-conf, kind="stable"):
+        if not suppressed[i]:
+            keep.append(i)
+            suppressed |= overlap[i]
+    return np.array(keep, dtype=np.int64)
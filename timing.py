@@ -0,0 +1,44 @@
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    # Collects how long each pipeline stage (decode, predict, filter, annotate, encode, write, ...)
+    # takes per call, from any thread. Durations are kept as compact float arrays so percentiles can
+    # be computed at the end of the run.
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = array("d")
+            samples.append(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def summary(self):
+        # {stage: {"count", "total_s", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}, in the order stages first ran
+        with self._lock:
+            samples = {stage: np.frombuffer(values, dtype=np.float64).copy()
+                       for stage, values in self._samples.items()}
+        summary = {}
+        for stage, values in samples.items():
+            p50, p95 = np.percentile(values, [50, 95]) * 1000
+            summary[stage] = {"count": len(values), "total_s": round(float(values.sum()), 3),
+                              "mean_ms": round(float(values.mean()) * 1000, 2), "p50_ms": round(float(p50), 2),
+                              "p95_ms": round(float(p95), 2), "max_ms": round(float(values.max()) * 1000, 2)}
+        return summary
@@ -0,0 +1,95 @@
+import numpy as np
+
+# A box that doesn't overlap a track enough can still join it when its centre is within
+# this many track-box diagonals (fast, small targets often don't overlap between sampled frames)
+CENTROID_MATCH_DIAGONALS = 1.0
+
+
+def box_iou(a, b):
+    # IoU of every box in a (N, 4) against every box in b (M, 4), as an (N, M) matrix
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+class Track:
+    # One tracked object: where it was first/last seen and the frame where it was most confident
+
+    def __init__(self, track_id, cls, box, index, milliseconds):
+        self.id = track_id
+        self.cls = cls
+        self.box = box
+        self.first_frame, self.first_ms = index, milliseconds
+        self.last_frame, self.last_ms = index, milliseconds
+        self.hits = 0
+        self.best_conf = -1.0
+        self.best_frame = None  # (index, milliseconds, frame, detections, box position in detections)
+
+    def update(self, box, conf, index, milliseconds, frame, detections, position):
+        self.box = box
+        self.last_frame, self.last_ms = index, milliseconds
+        self.hits += 1
+        if conf > self.best_conf:
+            self.best_conf = conf
+            self.best_frame = (index, milliseconds, frame, detections, position)
+
+
+class IoUTracker:
+    # Greedy IoU/centroid tracker over per-frame detections. Each box joins the live track of
+    # the same class it overlaps most (IoU >= min_iou), failing that the nearest one within
+    # CENTROID_MATCH_DIAGONALS, otherwise it starts a new track. A track ends once it goes
+    # unmatched for more than max_gap frames of video.
+
+    def __init__(self, min_iou=0.3, max_gap=30):
+        self.min_iou = min_iou
+        self.max_gap = max_gap
+        self._tracks = []
+        self._next_id = 1
+
+    def update(self, index, milliseconds, frame, detections):
+        # Feeds one processed frame (detections may be empty); returns the tracks that ended
+        boxes, confs, classes = detections.xyxy, detections.conf, detections.cls
+        unmatched = set(range(len(confs)))
+
+        if self._tracks and len(confs):
+            track_boxes = np.array([track.box for track in self._tracks], dtype=np.float32)
+            track_classes = np.array([track.cls for track in self._tracks])
+            iou = box_iou(track_boxes, boxes)
+
+            track_centres = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+            centres = (boxes[:, :2] + boxes[:, 2:]) / 2
+            distance = np.linalg.norm(track_centres[:, None, :] - centres[None, :, :], axis=2)
+            diagonal = np.linalg.norm(track_boxes[:, 2:] - track_boxes[:, :2], axis=1)[:, None]
+            near = distance <= diagonal * CENTROID_MATCH_DIAGONALS
+
+            # IoU matches (score 1..2) always win over centroid-only matches (score 0..1)
+            score = np.where(iou >= self.min_iou, 1 + iou,
+                             np.where(near, 1 - distance / np.maximum(diagonal, 1e-9), -1))
+            score[track_classes[:, None] != classes[None, :]] = -1
+
+            while True:
+                t, d = np.unravel_index(np.argmax(score), score.shape)
+                if score[t, d] < 0:
+                    break
+                self._tracks[t].update(boxes[d], float(confs[d]), index, milliseconds, frame, detections, d)
+                unmatched.discard(d)
+                score[t, :] = -1
+                score[:, d] = -1
+
+        for d in sorted(unmatched):
+            track = Track(self._next_id, int(classes[d]), boxes[d], index, milliseconds)
+            track.update(boxes[d], float(confs[d]), index, milliseconds, frame, detections, d)
+            self._next_id += 1
+            self._tracks.append(track)
+
+        ended = [track for track in self._tracks if index - track.last_frame > self.max_gap]
+        self._tracks = [track for track in self._tracks if index - track.last_frame <= self.max_gap]
+        return ended
+
+    def finish(self):
+        # Ends every live track, e.g. when the video is over
+        ended, self._tracks = self._tracks, []
+        return ended